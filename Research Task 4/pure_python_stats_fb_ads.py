@@ -1,11 +1,19 @@
 import csv
 import math
+import sys
 from collections import Counter
+from pathlib import Path
+
+# instrument.py lives with the LLM bias lab scripts and is shared from there
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Research Task 8" / "llm-bias-lab"
+                       / "llm-bias-lab" / "scripts"))
+import instrument  # noqa: E402
 
 # -------- Configuration --------
 FILE_PATH = r"C:\Users\Hrush\Desktop\Semesters\OPT Research\Datasets\Cleaned\2024_fb_ads_president_scored_anon_cleaned.csv" # File Path
 SAMPLE_SIZE = 1000  # Use None to load full file
 GROUP_LIMIT = 10     # Limit number of groups shown
+TRACE_PATH = None    # e.g. "trace.json" to write per-function timings and peak memory
 # --------------------------------
 
 def is_float(value):
@@ -46,6 +54,7 @@ def compute_non_numeric_stats(values):
     }
 
 
+@instrument.traced(items=lambda rows, *a, **k: len(rows))
 def load_csv(file_path, sample_size=None):
     with open(file_path, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
@@ -57,6 +66,7 @@ def load_csv(file_path, sample_size=None):
     return data
 
 
+@instrument.traced(items=lambda summary, data: len(data))
 def summarize_data(data):
     if not data:
         return {}
@@ -82,6 +92,8 @@ def print_summary(summary):
 
 
 if __name__ == "__main__":
+    if TRACE_PATH:
+        instrument.enable(TRACE_PATH)
     print(" Loading data...")
     data = load_csv(FILE_PATH, sample_size=SAMPLE_SIZE)
 
@@ -99,6 +111,7 @@ print("grouped stats using pure python")
 
 from collections import defaultdict
 
+@instrument.traced(items=lambda grouped, data, keys: len(data))
 def group_data(data, keys):
     grouped = defaultdict(list)
     for row in data:
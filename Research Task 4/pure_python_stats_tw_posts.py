@@ -1,13 +1,22 @@
 import csv
 import math
+import sys
 from collections import defaultdict, Counter
+from pathlib import Path
+
+# instrument.py lives with the LLM bias lab scripts and is shared from there
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Research Task 8" / "llm-bias-lab"
+                       / "llm-bias-lab" / "scripts"))
+import instrument  # noqa: E402
 
 # -------- Configuration --------
 FILE_PATH = r"C:\Users\Hrush\Desktop\Semesters\OPT Research\Datasets\Cleaned\2024_tw_posts_president_scored_anon_cleaned.csv" # File Path
 SAMPLE_SIZE = None  # Use None to load full file
 GROUP_LIMIT = 10     # Limit number of groups shown
+TRACE_PATH = None    # e.g. "trace.json" to write per-function timings and peak memory
 # --------------------------------
 
+@instrument.traced(items=lambda rows, *a, **k: len(rows))
 def load_csv(file_path, sample_size=None):
     data = []
     with open(file_path, newline='', encoding='utf-8') as f:
@@ -55,6 +64,7 @@ def compute_non_numeric_stats(values):
     }
 
 
+@instrument.traced(items=lambda summary, data: len(data))
 def summarize_data(data):
     if not data:
         return {}
@@ -72,6 +82,7 @@ def summarize_data(data):
     return summary
 
 
+@instrument.traced(items=lambda grouped, data, keys: len(data))
 def group_data(data, keys):
     grouped = defaultdict(list)
     for row in data:
@@ -104,6 +115,8 @@ def summarize_groups(data, group_keys, limit=GROUP_LIMIT):
 
 # -------- Main Execution --------
 if __name__ == "__main__":
+    if TRACE_PATH:
+        instrument.enable(TRACE_PATH)
     print(f"📥 Loading dataset: {FILE_PATH}")
     data = load_csv(FILE_PATH, SAMPLE_SIZE)
     print(f"✅ Loaded {len(data)} rows and {len(data[0])} columns")
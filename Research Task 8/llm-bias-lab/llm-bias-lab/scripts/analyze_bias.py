@@ -1,73 +1,137 @@
+import csv
 import json
-import re
+import os
 import argparse
+import hashlib
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from collections import defaultdict
 import pandas as pd
-from textblob import TextBlob
 
-def clean_text(text):
-    text = re.sub(r'[^A-Za-z0-9\s]', '', text)
-    return text.lower().strip()
+import instrument
+from jsonl_io import detect_compression
+from response_store import is_store, iter_responses
+from sentiment import SCORERS, ScoreCache, score_texts
+from significance import run_tests
+from similarity import SimilarityCollector
+from textnorm import tokenize
 
-def sentiment_score(text):
-    try:
-        return TextBlob(text).sentiment.polarity
-    except Exception:
-        return 0.0
+WORD_FIELDS = ["hypothesis", "base_condition", "compare_condition", "word_overlap_ratio"]
+STATE_FILE = "analyze_state.json"
+HEAD_BYTES = 4096  # input prefix hashed to recognise the same, growing log
+# fields analysis reads; a response store only loads these columns
+RECORD_COLUMNS = ["model", "prompt_id", "hypothesis", "condition", "sample_index", "response_text"]
 
 def load_responses(path):
-    responses = []
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                responses.append(json.loads(line))
-    return responses
+    return list(iter_responses(path, RECORD_COLUMNS))
 
-def analyze_word_differences(responses):
+def chunked(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+class BiasAggregator:
     """
-    Measures lexical overlap across prompt conditions for each hypothesis.
+    Streaming word-overlap and sentiment aggregates.
+
+    Only per-hypothesis base word sets and per-(hypothesis, condition)
+    sentiment sums are held in memory. Word-overlap rows are appended to one
+    spill file per hypothesis and stitched together in first-seen order when
+    the summary is written, so output matches the in-memory version.
     """
-    summary = []
-    grouped = defaultdict(list)
 
-    for r in responses:
-        grouped[r["hypothesis"]].append((r["condition"], r["response_text"]))
+    def __init__(self, spill_dir, state=None):
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        state = state or {}
+        self.hyp_order = state.get("hyp_order", [])
+        self.base = {h: (c, set(words)) for h, (c, words) in state.get("base", {}).items()}
+        # (hypothesis, condition) -> [kahan sum, compensation, count]
+        self.sentiment = {tuple(k.split("\x1f", 1)): v for k, v in state.get("sentiment", {}).items()}
+        self.records = state.get("records", 0)
+        self._spills = {}
+        # drop rows spilled by a run that died before saving its state
+        sizes = state.get("spill_sizes", {})
+        for spill in self.spill_dir.glob("words_*.csv"):
+            size = sizes.get(spill.stem)
+            if size is None:
+                spill.unlink()
+            elif spill.stat().st_size > size:
+                with open(spill, "r+b") as f:
+                    f.truncate(size)
 
-    for hyp, items in grouped.items():
-        base_words = None
-        base_condition = None
+    def _spill(self, hyp):
+        if hyp not in self._spills:
+            idx = self.hyp_order.index(hyp)
+            f = open(self.spill_dir / f"words_{idx}.csv", "a", newline="", encoding="utf-8")
+            self._spills[hyp] = (f, csv.writer(f, lineterminator=os.linesep))
+        return self._spills[hyp][1]
 
-        for condition, text in items:
-            words = set(clean_text(text).split())
-            if base_words is None:
-                base_words = words
-                base_condition = condition
+    def update_words(self, records):
+        for r in records:
+            hyp, condition = r["hypothesis"], r["condition"]
+            words = set(tokenize(r["response_text"]))
+            if hyp not in self.base:
+                self.hyp_order.append(hyp)
+                self.base[hyp] = (condition, words)
                 continue
-
+            base_condition, base_words = self.base[hyp]
             overlap = len(base_words.intersection(words)) / max(len(base_words), 1)
-            summary.append({
-                "hypothesis": hyp,
-                "base_condition": base_condition,
-                "compare_condition": condition,
-                "word_overlap_ratio": round(overlap, 3)
-            })
+            self._spill(hyp).writerow([hyp, base_condition, condition, round(overlap, 3)])
 
-    return pd.DataFrame(summary)
+    def update_sentiment(self, records, scores):
+        for r, score in zip(records, scores):
+            acc = self.sentiment.setdefault((r["hypothesis"], r["condition"]), [0.0, 0.0, 0])
+            # Kahan summation, as pandas' groupby mean does
+            y = score - acc[1]
+            t = acc[0] + y
+            acc[1] = (t - acc[0]) - y
+            acc[0] = t
+            acc[2] += 1
 
-def analyze_sentiment_differences(responses):
-    """
-    Measures average sentiment per condition within each hypothesis.
-    """
-    data = []
-    for r in responses:
-        data.append({
-            "hypothesis": r["hypothesis"],
-            "condition": r["condition"],
-            "sentiment": sentiment_score(r["response_text"])
-        })
+    def update(self, records, scores):
+        self.update_words(records)
+        self.update_sentiment(records, scores)
+        self.records += len(records)
+
+    def close(self):
+        for f, _ in self._spills.values():
+            f.close()
+        self._spills = {}
 
-    df = pd.DataFrame(data)
+    def write_word_summary(self, path):
+        self.close()
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            csv.writer(out, lineterminator=os.linesep).writerow(WORD_FIELDS)
+            for idx in range(len(self.hyp_order)):
+                spill = self.spill_dir / f"words_{idx}.csv"
+                if spill.exists():
+                    with open(spill, "r", newline="", encoding="utf-8") as f:
+                        shutil.copyfileobj(f, out)
+
+    def sentiment_summary(self):
+        rows = [
+            {"hypothesis": h, "condition": c, "sentiment": acc[0] / acc[2]}
+            for (h, c), acc in self.sentiment.items() if acc[2]
+        ]
+        return summarize_sentiment(pd.DataFrame(rows, columns=["hypothesis", "condition", "sentiment"]))
+
+    def state(self):
+        self.close()
+        return {
+            "spill_sizes": {p.stem: p.stat().st_size for p in self.spill_dir.glob("words_*.csv")},
+            "hyp_order": self.hyp_order,
+            "base": {h: [c, sorted(words)] for h, (c, words) in self.base.items()},
+            "sentiment": {f"{h}\x1f{c}": acc for (h, c), acc in self.sentiment.items()},
+            "records": self.records,
+        }
+
+def summarize_sentiment(df):
     sentiment_summary = (
         df.groupby(["hypothesis", "condition"])["sentiment"]
         .mean()
@@ -80,27 +144,183 @@ def analyze_sentiment_differences(responses):
     sentiment_summary = sentiment_summary.reset_index()
     return sentiment_summary
 
+def analyze_word_differences(responses):
+    """
+    Measures lexical overlap across prompt conditions for each hypothesis.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        agg = BiasAggregator(tmp)
+        agg.update_words(responses)
+        agg.write_word_summary(Path(tmp) / "words.csv")
+        return pd.read_csv(Path(tmp) / "words.csv", dtype={c: str for c in WORD_FIELDS[:3]})
+
+def analyze_sentiment_differences(responses, scorer="textblob", workers=None, cache=None):
+    """
+    Measures average sentiment per condition within each hypothesis.
+    """
+    scores = score_texts([r["response_text"] for r in responses], scorer=scorer, workers=workers, cache=cache)
+    data = []
+    for r, score in zip(responses, scores):
+        data.append({
+            "hypothesis": r["hypothesis"],
+            "condition": r["condition"],
+            "sentiment": score
+        })
+    return summarize_sentiment(pd.DataFrame(data))
+
+def _head_hash(path, size=HEAD_BYTES):
+    """Hash of the first `size` bytes, which identifies the file as long as it only grows."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(size)).hexdigest()
+
+def iter_appended(path, offset, progress):
+    """Yield records from complete lines after byte `offset`; progress["offset"] tracks the end of the last one."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partial line still being written
+            progress["offset"] += len(line)
+            if line.strip():
+                yield json.loads(line)
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--input", default="results/responses.jsonl", help="Path to model responses JSONL file")
+    ap.add_argument("--input", default="results/responses.jsonl", help="Model responses: JSONL (.gz/.zst ok) or a response store (.sqlite)")
     ap.add_argument("--outdir", default="analysis", help="Output directory for CSV summaries")
+    ap.add_argument("--scorer", choices=SCORERS, default="textblob", help="Sentiment scorer")
+    ap.add_argument("--workers", type=int, default=None, help="Processes for sentiment scoring (default: CPU count)")
+    ap.add_argument("--score-cache", default=None, help="SQLite sentiment memo (default: <outdir>/sentiment_cache.sqlite)")
+    ap.add_argument("--no-score-cache", action="store_true", help="Score every response from scratch")
+    ap.add_argument("--chunk-size", type=int, default=2048, help="Responses read and scored per batch")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Only process lines appended since the last run (state kept in <outdir>/analyze_state.json)")
+    ap.add_argument("--similarity", action="store_true",
+                    help="Also write all-vs-all Jaccard/cosine similarity across conditions, models and samples")
+    ap.add_argument("--similarity-exact-max", type=int, default=1500,
+                    help="Largest response count compared exactly; above it MinHash/LSH estimates are used")
+    ap.add_argument("--similarity-threshold", type=float, default=0.8,
+                    help="Jaccard at or above which a pair is reported as a near duplicate")
+    ap.add_argument("--significance", action="store_true",
+                    help="Also write permutation/bootstrap tests and effect sizes between conditions")
+    ap.add_argument("--resamples", type=int, default=10_000, help="Permutation and bootstrap resamples per test")
+    ap.add_argument("--seed", type=int, default=0, help="Seed for resampling")
+    ap.add_argument("--only", choices=["words", "sentiment"], default=None,
+                    help="Compute only lexical (words, similarity) or only sentiment (sentiment, significance) outputs")
+    instrument.add_arguments(ap)
     args = ap.parse_args()
+    instrument.setup(args)
+    if args.only and args.incremental:
+        ap.error("--only cannot be combined with --incremental")
+    if args.only == "words" and args.significance:
+        ap.error("--significance needs sentiment scores; drop --only words")
+    if args.only == "sentiment" and args.similarity:
+        ap.error("--similarity is lexical; drop --only sentiment")
+    do_words, do_sentiment = args.only != "sentiment", args.only != "words"
+    if args.similarity and args.incremental:
+        ap.error("--similarity needs every response; run it without --incremental")
+    if args.significance and args.incremental:
+        ap.error("--significance needs every response; run it without --incremental")
 
     path = Path(args.input)
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
+    cache = None if args.no_score_cache or not do_sentiment else ScoreCache(args.score_cache or outdir / "sentiment_cache.sqlite")
+
+    state_path = outdir / STATE_FILE
+    spill_root = outdir / ".analyze_state" if args.incremental else Path(tempfile.mkdtemp(prefix="analyze_bias_"))
+    state = None
+    if args.incremental:
+        if detect_compression(path) or is_store(path):
+            ap.error("--incremental needs an uncompressed JSONL input")
+        if state_path.exists():
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            stale = (state.get("input") != str(path.resolve()) or state.get("scorer") != args.scorer
+                     or state.get("offset", 0) > path.stat().st_size
+                     or state.get("head_hash") != _head_hash(path, state.get("head_bytes", HEAD_BYTES)))
+            if stale:
+                print("Input or scorer changed since the last run; starting over.")
+                state = None
+        if state is None:
+            shutil.rmtree(spill_root, ignore_errors=True)
+
+    # one process pool for the whole run; a pool per chunk costs more than it saves
+    workers = args.workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if do_sentiment and workers > 1 else None
+    try:
+        agg = BiasAggregator(spill_root, state["aggregates"] if state else None)
+        progress = {"offset": state["offset"] if state else 0}
+        records = iter_appended(path, progress["offset"], progress) if args.incremental else iter_responses(path, RECORD_COLUMNS)
+
+        print(f"Streaming responses from {path}" + (f" (sentiment: {args.scorer})..." if do_sentiment else "..."))
+        sim = SimilarityCollector(exact_max=args.similarity_exact_max, threshold=args.similarity_threshold) if args.similarity else None
+        per_response = [] if args.significance else None
+        n_new = 0
+        for chunk in chunked(records, args.chunk_size):
+            if do_sentiment:
+                scores = score_texts([r["response_text"] for r in chunk], scorer=args.scorer, workers=args.workers,
+                                     cache=cache, pool=pool)
+                agg.update_sentiment(chunk, scores)
+            if do_words:
+                with instrument.span("update_words", items=len(chunk)):
+                    agg.update_words(chunk)
+            agg.records += len(chunk)
+            if per_response is not None:
+                per_response.extend(
+                    (r["hypothesis"], r["condition"], r.get("model"), score, len(tokenize(r["response_text"])))
+                    for r, score in zip(chunk, scores)
+                )
+            if sim is not None:
+                with instrument.span("similarity.add", items=len(chunk)):
+                    for r in chunk:
+                        sim.add(r, set(tokenize(r["response_text"])))
+            instrument.count("responses", len(chunk))
+            n_new += len(chunk)
+        print(f"Processed {n_new} new entries ({agg.records} total)")
+
+        if do_words:
+            print("Writing word-level overlap...")
+            agg.write_word_summary(outdir / "word_overlap_summary.csv")
+
+        if do_sentiment:
+            print("Writing sentiment bias...")
+            agg.sentiment_summary().to_csv(outdir / "sentiment_summary.csv", index=False)
 
-    print(f"Loading responses from {path}...")
-    responses = load_responses(path)
-    print(f"Loaded {len(responses)} entries")
+        if sim is not None:
+            print("Writing pairwise similarity...")
+            with instrument.span("similarity.results"):
+                matrix, dist, dups = sim.results()
+            matrix.to_csv(outdir / "similarity_matrix.csv")
+            dist.to_csv(outdir / "similarity_distribution.csv", index=False)
+            dups.to_csv(outdir / "near_duplicates.csv", index=False)
 
-    print("Analyzing word-level overlap...")
-    df_words = analyze_word_differences(responses)
-    df_words.to_csv(outdir / "word_overlap_summary.csv", index=False)
+        if per_response is not None:
+            print(f"Testing condition effects ({args.resamples} resamples)...")
+            df = pd.DataFrame(per_response, columns=["hypothesis", "condition", "model", "sentiment", "response_words"])
+            with instrument.span("significance", items=len(df)):
+                tests = run_tests(df, ["sentiment", "response_words"], n_resamples=args.resamples,
+                                  workers=args.workers, seed=args.seed)
+            tests.to_csv(outdir / "significance.csv", index=False)
 
-    print("Analyzing sentiment bias...")
-    df_sentiment = analyze_sentiment_differences(responses)
-    df_sentiment.to_csv(outdir / "sentiment_summary.csv", index=False)
+        if args.incremental:
+            with open(state_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "input": str(path.resolve()),
+                    # only the already-read prefix is hashed, so appends to a small log don't change it
+                    "head_bytes": min(progress["offset"], HEAD_BYTES),
+                    "head_hash": _head_hash(path, min(progress["offset"], HEAD_BYTES)),
+                    "scorer": args.scorer,
+                    "offset": progress["offset"],
+                    "aggregates": agg.state(),
+                }, f)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if cache is not None:
+            cache.close()
+        if not args.incremental:
+            shutil.rmtree(spill_root, ignore_errors=True)
 
     print("\n✅ Analysis complete.")
     print(f"Files saved in {outdir.resolve()}")
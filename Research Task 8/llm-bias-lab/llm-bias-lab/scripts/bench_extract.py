@@ -0,0 +1,80 @@
+"""
+bench_extract.py
+Claim extraction throughput: KV_RE.finditer vs the linear scanner, serial
+and across processes, on synthetic long responses.
+
+A small share of responses is pathological (a long separator-free run that
+makes KV_RE quadratic); --skip-regex leaves the regex out when those make it
+too slow to wait for.
+
+Usage:
+  python scripts/bench_extract.py --n 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from extract_claims import iter_extracted_claims
+from validate_claims import KV_RE, scan_key_values
+
+PROSE = ("Entity D shows the strongest scoring profile relative to minutes played and "
+         "should be prioritised; its efficiency is well above the group average while "
+         "Entity J trails on every shooting metric in the table").split()
+METRICS = ["goals", "assists", "minutes", "fg_pct", "xg per 90", "win rate"]
+
+
+def make_response(rng, length, pathological):
+    if pathological:
+        return "Entity " + "a" * length
+    parts, size = [], 0
+    while size < length:
+        if rng.random() < 0.2:
+            piece = f"{rng.choice(METRICS)}: {rng.randint(0, 999)}.{rng.randint(0, 9)}\n"
+        else:
+            piece = " ".join(rng.choice(PROSE) for _ in range(12)) + ". "
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts)
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {elapsed:8.2f}s  {n / elapsed:>10,.0f} responses/s  ({count:,} pairs)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000, help="Responses")
+    ap.add_argument("--length", type=int, default=3000, help="Characters per response")
+    ap.add_argument("--pathological-share", type=float, default=0.001)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--skip-regex", action="store_true")
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    texts = [make_response(rng, args.length, rng.random() < args.pathological_share) for _ in range(args.n)]
+    print(f"{args.n:,} responses of ~{args.length} chars ({sum(map(len, texts)) / 1e6:.0f}M chars)")
+
+    if not args.skip_regex:
+        timed("KV_RE.finditer", args.n, lambda: sum(1 for t in texts for _ in KV_RE.finditer(t)))
+    timed("scanner", args.n, lambda: sum(1 for t in texts for _ in scan_key_values(t)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "responses.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for i, t in enumerate(texts):
+                f.write(json.dumps({"prompt_id": f"p{i}", "response_text": t}) + "\n")
+        del texts
+        for workers in sorted({1, args.workers or os.cpu_count() or 1}):
+            timed(f"extract (workers={workers})", args.n,
+                  lambda: sum(1 for _ in iter_extracted_claims(path, workers=workers, max_pairs=10**9)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+bench_textnorm.py
+Throughput of the textnorm helpers against the original per-call regexes.
+
+Usage:
+  python scripts/bench_textnorm.py --n 1000000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from textnorm import clean_text, clean_texts, norm_string
+
+_WS_RE = re.compile(r"\s+")
+
+WORDS = ("the player scoring rate is higher than average for a forward with "
+         "limited minutes goals assists xG per 90 performance trend developing "
+         "struggling strong weak season café naïve Ｍüller").split()
+
+
+def legacy_clean_text(text):
+    text = re.sub(r'[^A-Za-z0-9\s]', '', text)
+    return text.lower().strip()
+
+
+def legacy_norm_string(x):
+    return _WS_RE.sub(" ", x.strip().casefold())
+
+
+def make_texts(n, words, seed, unicode_share):
+    rng = random.Random(seed)
+    ascii_words = [w for w in WORDS if w.isascii()]
+    out = []
+    for i in range(n):
+        pool = WORDS if rng.random() < unicode_share else ascii_words
+        body = " ".join(rng.choice(pool) for _ in range(words))
+        out.append(f"{body}, ({i})! ")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000, help="Texts per corpus")
+    ap.add_argument("--chunk", type=int, default=100_000, help="Texts generated and timed at a time")
+    ap.add_argument("--unicode-share", type=float, default=0.1, help="Fraction of texts with non-ASCII words")
+    args = ap.parse_args()
+
+    for corpus, words in (("short", 8), ("long", 120)):
+        print(f"{corpus} texts ({words} words), n={args.n:,}")
+        totals = {}
+        for start in range(0, args.n, args.chunk):
+            texts = make_texts(min(args.chunk, args.n - start), words, start, args.unicode_share)
+            for label, fn in (
+                ("clean_text (legacy)", lambda ts: [legacy_clean_text(t) for t in ts]),
+                ("clean_text", lambda ts: [clean_text(t) for t in ts]),
+                ("clean_texts (batched)", clean_texts),
+                ("norm_string (legacy)", lambda ts: [legacy_norm_string(t) for t in ts]),
+                ("norm_string", lambda ts: [norm_string(t) for t in ts]),
+            ):
+                t0 = time.perf_counter()
+                fn(texts)
+                totals[label] = totals.get(label, 0.0) + time.perf_counter() - t0
+        for label, elapsed in totals.items():
+            print(f"  {label:<24} {elapsed:8.2f}s  {args.n / elapsed:>12,.0f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
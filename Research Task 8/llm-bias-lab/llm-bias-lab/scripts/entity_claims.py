@@ -0,0 +1,339 @@
+"""
+entity_claims.py
+Turn free-text responses into structured claims that validate_claims can
+check, without hand transcription.
+
+For each response, the statistics block of its prompt (list, CSV or
+markdown style from experiment_design) is parsed into an entity -> metric
+-> value table. An Aho-Corasick automaton over that table's entity labels
+(plus "Player X" aliases), player names and metric labels finds every
+mention in one pass over the response. Labels are matched as the table
+writes them: metric columns named by a bare number or a single letter
+(common in headerless sheets) only in "<label>: value" form or after
+metric/column/stat, and without a name column "Player 4" / "row 4" is the
+fourth entity; numbers are picked up by a
+linear-time number pattern, since misquoted values are not in any table.
+Each number is attributed to the closest preceding entity and metric
+mention in the same sentence.
+
+Outputs:
+  --claims-out  example_id,key,claimed_value for every <entity>_<metric> citation
+  --truth-out   key,truth_value for every <entity>_<metric> cell in the prompts' tables
+  --details     one JSON line per response: picked entity, mentions and citations
+                (picks are judgments with no ground truth, so they stay out of validation)
+
+Usage:
+  python scripts/entity_claims.py --input results/responses.jsonl --validate
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from response_store import iter_responses
+from validate_claims import run as validate
+
+try:
+    import ahocorasick  # pyahocorasick, optional C implementation
+except ImportError:
+    ahocorasick = None
+
+_NUMBER_RE = re.compile(r"(?<![\w.])[-+]?\d+(?:,\d{3})*(?:\.\d+)?%?(?![\w])")
+_SENTENCE_END_RE = re.compile(r"[.!?](?:\s|$)|\n")
+_ENTITY_LINE_RE = re.compile(r"^(Entity [A-Z]\d*)(?: — (.*))?:$")
+_METRIC_LINE_RE = re.compile(r"^  - (.+?): (.*)$")
+
+
+# ------------------------- Automaton -------------------------
+
+class AhoCorasick:
+    """Case-insensitive multi-pattern matcher; uses pyahocorasick when installed."""
+
+    def __init__(self, patterns: Dict[str, Tuple[str, str]]):
+        # patterns: lowercased text -> (kind, canonical value)
+        self.patterns = patterns
+        if ahocorasick is not None:
+            self._auto = ahocorasick.Automaton()
+            for p, payload in patterns.items():
+                self._auto.add_word(p, (len(p), payload))
+            self._auto.make_automaton()
+            return
+        self._auto = None
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[str]] = [[]]
+        for p in patterns:
+            node = 0
+            for ch in p:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(p)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Tuple[str, str]]]:
+        """Yield (start, end, payload) for every occurrence, overlapping ones included."""
+        lowered = text.lower()
+        if len(lowered) != len(text):  # keep offsets aligned when lowercasing expands a character
+            lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+        text = lowered
+        if self._auto is not None:
+            for end, (length, payload) in self._auto.iter(text):
+                yield end + 1 - length, end + 1, payload
+            return
+        goto, fail, out, node = self.goto, self.fail, self.out, 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for p in out[node]:
+                yield i + 1 - len(p), i + 1, self.patterns[p]
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def find_mentions(auto: AhoCorasick, text: str) -> List[Tuple[int, int, str, str]]:
+    """Whole-word, leftmost-longest, non-overlapping mentions: (start, end, kind, value)."""
+    hits = []
+    for start, end, (kind, value) in auto.iter(text):
+        if start > 0 and _is_word(text[start - 1]):
+            continue
+        if end < len(text) and _is_word(text[end]):
+            continue
+        hits.append((start, end, kind, value))
+    hits.sort(key=lambda h: (h[0], -(h[1] - h[0])))
+    out, last_end = [], -1
+    for h in hits:
+        if h[0] >= last_end:
+            out.append(h)
+            last_end = h[1]
+    return out
+
+
+# ------------------------- Prompt tables -------------------------
+
+def parse_stats_block(prompt_text: str) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+    """Return ({entity: {metric: value}}, {player name: entity}) from a prompt's statistics block."""
+    lines = prompt_text.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("Player statistics (anonymized, CSV):"):
+            return _parse_csv_block(lines[i + 1:])
+        if line.startswith("Player statistics (anonymized):"):
+            if i + 1 < len(lines) and lines[i + 1].startswith("| "):
+                return _parse_markdown_block(lines[i + 1:])
+            return _parse_list_block(lines[i + 1:])
+    return {}, {}
+
+
+def _parse_list_block(lines):
+    table, names, entity = {}, {}, None
+    for line in lines:
+        m = _ENTITY_LINE_RE.match(line)
+        if m:
+            entity = m.group(1)
+            table[entity] = {}
+            if m.group(2):
+                names[m.group(2)] = entity
+            continue
+        m = _METRIC_LINE_RE.match(line)
+        if m and entity is not None:
+            if m.group(1) != "Demographics":
+                table[entity][m.group(1)] = m.group(2)
+            continue
+        if table:
+            break
+    return table, names
+
+
+def _parse_rows(header, rows):
+    table, names = {}, {}
+    for row in rows:
+        rec = dict(zip(header, row))
+        entity = rec.pop("entity", None)
+        if not entity:
+            continue
+        if rec.get("name"):
+            names[rec.pop("name")] = entity
+        rec.pop("name", None)
+        rec.pop("Demographics", None)
+        table[entity] = rec
+    return table, names
+
+
+def _parse_csv_block(lines):
+    body = []
+    for line in lines:
+        if not line.strip():
+            break
+        body.append(line)
+    rows = list(csv.reader(io.StringIO("\n".join(body))))
+    return _parse_rows(rows[0], rows[1:]) if rows else ({}, {})
+
+
+def _parse_markdown_block(lines):
+    rows = []
+    for line in lines:
+        if not line.startswith("|"):
+            break
+        rows.append([c.strip() for c in line.strip().strip("|").split(" | ")])
+    if len(rows) < 2:
+        return {}, {}
+    return _parse_rows(rows[0], rows[2:])
+
+
+def slug(text: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", text.lower()).strip("_")
+
+
+def _label_forms(label: str) -> set:
+    """Spellings of a table label: as written, whitespace-collapsed and with underscores as spaces."""
+    label = label.lower()
+    collapsed = " ".join(label.split())
+    return {label, collapsed, collapsed.replace("_", " ")}
+
+
+def build_automaton(table: Dict[str, Dict[str, str]], names: Dict[str, str]) -> AhoCorasick:
+    patterns: Dict[str, Tuple[str, str]] = {}
+    metrics = {m for cells in table.values() for m in cells}
+    for m in metrics:
+        for form in _label_forms(m):
+            if form.isdigit() or len(form) == 1:
+                # bare numbers/letters collide with values and words; only as the block writes
+                # them ("4: 12.0") or named as a column
+                for f in (f"{form}:", f"{form} =", f"metric {form}", f"column {form}", f"col {form}",
+                          f"stat {form}", f'"{form}"', f"“{form}”"):
+                    patterns[f] = ("metric", m)
+            else:
+                patterns[form] = ("metric", m)
+    for name, entity in names.items():
+        for form in _label_forms(name):
+            patterns[form] = ("entity", entity)
+    for i, entity in enumerate(table, 1):
+        suffix = entity[len("entity"):].lower()
+        patterns[entity.lower()] = ("entity", entity)
+        patterns["player" + suffix] = ("entity", entity)
+        if not names:  # headerless tables: "Player 4" / "row 4" is the fourth row
+            for prefix in ("player", "row", "entity"):
+                patterns.setdefault(f"{prefix} {i}", ("entity", entity))
+    return AhoCorasick(patterns)
+
+
+# ------------------------- Extraction -------------------------
+
+def analyze_response(text: str, table: Dict[str, Dict[str, str]], auto: AhoCorasick) -> dict:
+    mentions = find_mentions(auto, text)
+    covered = {i for s, e, _, _ in mentions for i in range(s, e)}
+    numbers = [(m.start(), m.end(), m.group()) for m in _NUMBER_RE.finditer(text) if m.start() not in covered]
+    breaks = [m.start() for m in _SENTENCE_END_RE.finditer(text)]
+
+    events = sorted([(s, 0, kind, value) for s, e, kind, value in mentions] +
+                    [(s, 1, "number", value) for s, e, value in numbers])
+    entities, citations = [], []
+    entity = metric = None
+    b = 0
+    for pos, _, kind, value in events:
+        while b < len(breaks) and breaks[b] < pos:  # new sentence: forget the metric, keep the entity
+            metric = None
+            b += 1
+        if kind == "entity":
+            entity = value
+            if value not in entities:
+                entities.append(value)
+        elif kind == "metric":
+            metric = value
+        elif entity is not None and metric is not None:
+            table_value = table.get(entity, {}).get(metric)
+            citations.append({"entity": entity, "metric": metric, "value": value, "table_value": table_value})
+            metric = None
+    return {"picked_entity": entities[0] if entities else None, "entities": entities, "citations": citations}
+
+
+def iter_entity_claims(records: Iterable[dict]) -> Iterator[Tuple[dict, dict, Dict[str, Dict[str, str]]]]:
+    """Yield (record, analysis, table) per response; tables and automata are built once per distinct prompt block."""
+    cache: Dict[str, Tuple[dict, AhoCorasick]] = {}
+    for r in records:
+        prompt = r.get("prompt_text") or ""
+        h = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        if h not in cache:
+            table, names = parse_stats_block(prompt)
+            cache[h] = (table, build_automaton(table, names))
+        table, auto = cache[h]
+        yield r, analyze_response(r.get("response_text") or r.get("response") or "", table, auto), table
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract entity picks and cited statistics from responses.")
+    ap.add_argument("--input", default="results/responses.jsonl", help="Responses JSONL (.gz/.zst ok) or response store (.sqlite)")
+    ap.add_argument("--claims-out", default="results/entity_claims.csv")
+    ap.add_argument("--truth-out", default="results/entity_truth.csv")
+    ap.add_argument("--details", default="results/entity_claims.jsonl")
+    ap.add_argument("--validate", action="store_true", help="Run validate_claims on the outputs")
+    ap.add_argument("--report", default="results/entity_report.csv")
+    ap.add_argument("--summary", default="results/entity_summary.json")
+    args = ap.parse_args()
+
+    for p in (args.claims_out, args.truth_out, args.details):
+        os.makedirs(os.path.dirname(os.path.abspath(p)), exist_ok=True)
+
+    truth: Dict[str, Optional[str]] = {}
+    n = n_claims = 0
+    with open(args.claims_out, "w", newline="", encoding="utf-8") as cf, \
+            open(args.details, "w", encoding="utf-8") as df:
+        claims = csv.writer(cf)
+        claims.writerow(["example_id", "key", "claimed_value"])
+        seen_tables = set()
+        for r, res, table in iter_entity_claims(iter_responses(args.input)):
+            n += 1
+            example_id = r.get("example_id", r.get("prompt_id", ""))
+            for c in res["citations"]:
+                claims.writerow([example_id, f"{slug(c['entity'])}_{slug(c['metric'])}", c["value"]])
+                n_claims += 1
+            df.write(json.dumps({
+                "prompt_id": r.get("prompt_id"), "hypothesis": r.get("hypothesis"),
+                "condition": r.get("condition"), "model": r.get("model"), **res,
+            }, ensure_ascii=False) + "\n")
+            if id(table) not in seen_tables:
+                seen_tables.add(id(table))
+                for entity, cells in table.items():
+                    for metric, value in cells.items():
+                        key = f"{slug(entity)}_{slug(metric)}"
+                        # the same label can hold different values in different datasets
+                        truth[key] = value if truth.get(key, value) == value else None
+
+    with open(args.truth_out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["key", "truth_value"])
+        w.writerows((k, v) for k, v in truth.items() if v is not None)
+    ambiguous = sum(v is None for v in truth.values())
+    print(f"{n} responses -> {n_claims} claims; {len(truth) - ambiguous} truth cells"
+          + (f" ({ambiguous} ambiguous across datasets, dropped)" if ambiguous else ""))
+
+    if args.validate:
+        summary = validate(args.claims_out, args.truth_out, args.report, args.summary, 0.0, 0.0)
+        print(f"Validated {summary['total_claims']} claims (accuracy: {summary['accuracy']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,85 @@
 
-import argparse, hashlib, json
+import argparse, functools, glob, hashlib, json, os, pickle, re, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterable, Iterator
 import pandas as pd
 import numpy as np
+import yaml
+
+import instrument
+from prompt_bank import write_prompt_bank
+from prompt_budget import fit_blocks, get_tokenizer, model_budget
 
 
 def sha(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
 
 
-def load_table(path: str, sheet: str | None, header_row: int | None, skip_rows: int) -> pd.DataFrame:
+def dataset_hash(df: pd.DataFrame) -> str:
+    h = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    h.update("|".join(map(str, df.columns)).encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+@contextmanager
+def timed(stage: str):
+    t0 = time.perf_counter()
+    with instrument.span(stage):
+        yield
+    print(f"[timing] {stage}: {time.perf_counter() - t0:.3f}s")
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _excel_engine(engine: str | None) -> str | None:
+    """'auto' picks calamine (Rust reader) when python-calamine is installed, else openpyxl."""
+    if engine != "auto":
+        return engine
+    try:
+        import python_calamine  # noqa: F401
+        return "calamine"
+    except ImportError:
+        return None
+
+
+def _read_cached(path: Path):
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _write_cached(df: pd.DataFrame, stem: Path) -> Path:
+    """Parquet when pyarrow can store the frame; pickle for mixed-type object columns or no pyarrow."""
+    try:
+        out = stem.with_suffix(".parquet")
+        df.to_parquet(out, index=False)
+        return out
+    except Exception:
+        stem.with_suffix(".parquet").unlink(missing_ok=True)
+        out = stem.with_suffix(".pkl")
+        with open(out, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return out
+
+
+def _read_raw(path: str, sheet, header_row, skip_rows, engine) -> pd.DataFrame:
     p = Path(path)
     if p.suffix.lower() in (".xlsx", ".xls"):
         df = pd.read_excel(
             path,
             sheet_name=sheet or 0,
             header=header_row,     # None lets pandas infer
-            skiprows=skip_rows     # drop banner rows above header
+            skiprows=skip_rows,    # drop banner rows above header
+            engine=engine,
         )
     elif p.suffix.lower() == ".csv":
         df = pd.read_csv(path)
@@ -26,6 +89,35 @@ def load_table(path: str, sheet: str | None, header_row: int | None, skip_rows:
     return df
 
 
+def load_table(path: str, sheet: str | None, header_row: int | None, skip_rows: int,
+               cache_dir: str | None = None, engine: str | None = None) -> pd.DataFrame:
+    """
+    Read the source table. Excel sheets are slow to parse, so with `cache_dir`
+    the parsed frame is stored as Parquet (pickle fallback) keyed by the file
+    hash, sheet, header_row, skip_rows and engine, and reused on later runs.
+    """
+    engine = _excel_engine(engine)
+    p = Path(path)
+    if cache_dir is None or p.suffix.lower() not in (".xlsx", ".xls"):
+        with timed(f"read {p.name}"):
+            return _read_raw(path, sheet, header_row, skip_rows, engine)
+
+    with timed("hash source"):
+        params = f"{file_hash(path)}|{sheet}|{header_row}|{skip_rows}|{engine}|{pd.__version__}"
+    stem = Path(cache_dir) / f"{p.stem}-{hashlib.sha256(params.encode('utf-8')).hexdigest()[:16]}"
+    for cached in (stem.with_suffix(".parquet"), stem.with_suffix(".pkl")):
+        if cached.exists():
+            with timed(f"load cache {cached.name}"):
+                return _read_cached(cached)
+
+    with timed(f"read {p.name} (engine={engine or 'default'})"):
+        df = _read_raw(path, sheet, header_row, skip_rows, engine)
+    stem.parent.mkdir(parents=True, exist_ok=True)
+    with timed("write cache"):
+        _write_cached(df, stem)
+    return df
+
+
 def build_entity_labels(n: int):
     out = []
     for i in range(n):
@@ -43,26 +135,43 @@ def pick_focus_metric(cols):
     return cols[0] if cols else None
 
 
+_NUMERIC_OBJECT_KINDS = {"integer", "floating", "mixed-integer-float", "empty"}
+
+
+def _clean_numeric_text(text: pd.Series, strip_percent: bool) -> pd.Series:
+    # thousands separators and unicode minus signs; a lone "-" is left for
+    # to_numeric to coerce to NaN
+    out = (text.str.replace(",", "", regex=False)
+               .str.replace("\u2212", "-", regex=False)
+               .str.replace("–", "-", regex=False)
+               .str.strip())
+    return out.str.replace("%", "", regex=False) if strip_percent else out
+
+
 def _coerce_numeric_series(s: pd.Series) -> pd.Series:
     if s.dtype.kind in "biufc":
         return s
+    if pd.api.types.infer_dtype(s, skipna=True) in _NUMERIC_OBJECT_KINDS:
+        # object column that already holds only numbers/missing values
+        return pd.to_numeric(s, errors="coerce")
     text = s.astype(str)
-    has_percent = (text.str.contains("%")).mean() > 0.1
-    cleaned = (
-        text.str.replace(",", "", regex=False)
-            .str.replace("\u2212", "-", regex=False)
-            .str.replace("–", "-", regex=False)
-            .str.replace(r"^\s*-$", "", regex=True)
-            .str.strip()
-    )
+    has_percent = (text.str.contains("%", regex=False)).mean() > 0.1
+    # clean and parse each distinct string once, then broadcast back; missing values
+    # (kept as NaN by pandas' str dtype) get a code of their own and parse to NaN
+    codes, uniques = pd.factorize(text.to_numpy(dtype=object), use_na_sentinel=False)
+    cleaned = _clean_numeric_text(pd.Series(uniques, dtype=object), has_percent)
+    parsed = pd.to_numeric(cleaned, errors="coerce").to_numpy()
+    out = pd.Series(parsed[codes], index=s.index, name=s.name)
     if has_percent:
-        cleaned = cleaned.str.replace("%", "", regex=False)
-        out = pd.to_numeric(cleaned, errors="coerce") / 100.0
-    else:
-        out = pd.to_numeric(cleaned, errors="coerce")
+        out = out / 100.0
     return out
 
 
+def _coerce_columns(df: pd.DataFrame, skip=()) -> dict:
+    """Coerce every column except `skip`, keeping the column order."""
+    return {c: df[c] if c in skip else _coerce_numeric_series(df[c]) for c in df.columns}
+
+
 def clean_dataframe(df_in: pd.DataFrame):
     df = df_in.copy()
 
@@ -73,14 +182,13 @@ def clean_dataframe(df_in: pd.DataFrame):
     keep_cols = [c for c in df.columns if not str(c).lower().startswith("unnamed")]
     df = df.loc[:, keep_cols]
 
-    # coerce numeric-looking columns
-    coerced = {c: _coerce_numeric_series(df[c]) for c in df.columns}
-    df_num_try = pd.DataFrame(coerced)
-
     # optional name column
     name_cols = [c for c in df.columns if str(c).strip().lower() in {"player", "player name", "name"}]
     name_col = name_cols[0] if name_cols else None
 
+    # coerce numeric-looking columns (the name column is kept as text)
+    df_num_try = pd.DataFrame(_coerce_columns(df, skip={name_col}))
+
     # numeric metrics after coercion
     num_cols = [c for c in df_num_try.columns if c != name_col and pd.api.types.is_numeric_dtype(df_num_try[c])]
     if not num_cols:
@@ -90,15 +198,11 @@ def clean_dataframe(df_in: pd.DataFrame):
     left = df[[name_col]].rename(columns={name_col: "PlayerName"}) if name_col else pd.DataFrame(index=df.index)
     df_work = pd.concat([left, df_num_try[num_cols]], axis=1)
 
-    # drop non-player rows
-    def valid_row(r):
-        vals = r[num_cols]
-        nonnull = vals.notna().sum()
-        nonzero = (vals.fillna(0).abs() > 0).sum()
-        return (nonnull >= 3) and (nonzero >= 2)
-
+    # drop non-player rows: need >= 3 values and >= 2 of them non-zero
     df_work = df_work.dropna(how="all")
-    df_work = df_work[df_work.apply(valid_row, axis=1)].reset_index(drop=True)
+    vals = df_work[num_cols]
+    valid = (vals.notna().sum(axis=1) >= 3) & (vals.fillna(0).ne(0).sum(axis=1) >= 2)
+    df_work = df_work[valid].reset_index(drop=True)
 
     # cap to 12 highest-variance metrics
     if len(num_cols) > 12:
@@ -115,42 +219,280 @@ def clean_dataframe(df_in: pd.DataFrame):
     return df_work, num_cols
 
 
-def format_dataset_block(df: pd.DataFrame, include_demo=False, demo_col=None) -> str:
-    has_name = "PlayerName" in df.columns
-    metric_cols = [c for c in df.columns if c not in {"entity_label", "PlayerName", str(demo_col)} and pd.api.types.is_numeric_dtype(df[c])]
-    lines = ["Player statistics (anonymized):"]
-    for _, r in df.iterrows():
-        header = f"{r['entity_label']}" + (f" — {r['PlayerName']}" if has_name and pd.notna(r['PlayerName']) else "")
-        row_lines = [header + ":"]
-        for c in metric_cols:
-            v = r[c]
-            if pd.notna(v):
-                row_lines.append(f"  - {c}: {v}")
-        if include_demo and demo_col and demo_col in df.columns and pd.notna(r.get(demo_col)):
-            row_lines.append(f"  - Demographics: {r.get(demo_col)}")
-        lines.append("\n".join(row_lines))
+BLOCK_STYLES = ("list", "csv", "markdown")
+_BLOCK_CACHE: dict = {}
+_BLOCK_CACHE_MAX = 64
+
+
+def _column_text(s: pd.Series, prefix: str = "", missing: str = "") -> np.ndarray:
+    """
+    prefix + str(cell) for every cell of a column (missing cells -> `missing`),
+    as an object array. Numeric columns format each distinct value once.
+    """
+    values = s.to_numpy()
+    is_missing = s.isna().to_numpy()
+    if values.dtype.kind in "biuf":
+        if values.dtype.kind == "f":
+            # factorize on the raw bits so -0.0 and 0.0 keep their own text
+            bits = np.ascontiguousarray(values).view(f"i{values.dtype.itemsize}")
+            codes, uniq = pd.factorize(bits)
+            uniq = np.asarray(uniq).view(values.dtype)
+        else:
+            codes, uniq = pd.factorize(values)
+        text = np.array([prefix + str(u) for u in uniq] + [missing], dtype=object)[codes]
+    else:
+        text = np.array([prefix + str(v) for v in values.tolist()], dtype=object)
+    text[is_missing] = missing
+    return text
+
+
+def _render_list(df: pd.DataFrame, metric_cols, demo_col) -> str:
+    rows = _column_text(df["entity_label"])
+    if "PlayerName" in df.columns:
+        rows = rows + _column_text(df["PlayerName"], " — ")
+    rows = rows + ":"
+    for c in metric_cols:
+        rows = rows + _column_text(df[c], f"\n  - {c}: ")
+    if demo_col is not None:
+        rows = rows + _column_text(df[demo_col], "\n  - Demographics: ")
+    return "\n".join(["Player statistics (anonymized):"] + rows.tolist())
+
+
+def _render_table(df: pd.DataFrame, metric_cols, demo_col, style: str) -> str:
+    cols = ["entity_label"] + (["PlayerName"] if "PlayerName" in df.columns else []) + list(metric_cols)
+    headers = ["entity"] + (["name"] if "PlayerName" in df.columns else []) + [str(c) for c in metric_cols]
+    if demo_col is not None:
+        cols.append(demo_col)
+        headers.append("Demographics")
+    if style == "csv":
+        body = df[cols].to_csv(index=False, header=headers, lineterminator="\n").rstrip("\n")
+        return "Player statistics (anonymized, CSV):\n" + body
+    sep = " | "
+    rows = _column_text(df[cols[0]], "| ", "| ")
+    for c in cols[1:]:
+        rows = rows + _column_text(df[c], sep, sep)
+    lines = [
+        "Player statistics (anonymized):",
+        "| " + sep.join(headers) + " |",
+        "|" + "|".join("---" for _ in headers) + "|",
+    ]
+    lines.extend((rows + " |").tolist())
     return "\n".join(lines)
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--data", default="C:/Users/Hrush/Desktop/Semesters/OPT Research/Research Task 8/llm-bias-lab/llm-bias-lab/data/source.xlsx")
-    ap.add_argument("--sheet", default=None)
-    ap.add_argument("--out", default="prompts/prompt_bank.jsonl")
-    ap.add_argument("--demographics-col", default=None)
-    ap.add_argument("--focus-metric", default=None)
-    ap.add_argument("--header-row", type=int, default=None, help="0-based header row (None = infer)")
-    ap.add_argument("--skip-rows", type=int, default=0, help="rows to skip above header")
-    args = ap.parse_args()
+@instrument.traced(items=lambda block, df, *a, **k: len(df))
+def format_dataset_block(df: pd.DataFrame, include_demo=False, demo_col=None, style: str = "list") -> str:
+    """
+    Render the anonymized statistics block for a prompt.
+
+    style="list" is the original one-line-per-metric layout; "csv" and
+    "markdown" are compact tables that cost far fewer tokens. Rendering is
+    column-wise, and results are cached per (dataset hash, demographics, style).
+    """
+    if style not in BLOCK_STYLES:
+        raise ValueError(f"Unknown block style: {style} (expected one of {BLOCK_STYLES})")
+    use_demo = bool(include_demo and demo_col and demo_col in df.columns)
+    key = (dataset_hash(df), use_demo, demo_col if use_demo else None, style)
+    if key in _BLOCK_CACHE:
+        instrument.count("format_dataset_block.cache_hits")
+        return _BLOCK_CACHE[key]
 
-    df_raw = load_table(args.data, args.sheet, args.header_row, args.skip_rows)
-    df, num_cols = clean_dataframe(df_raw)
+    metric_cols = [c for c in df.columns if c not in {"entity_label", "PlayerName", str(demo_col)} and pd.api.types.is_numeric_dtype(df[c])]
+    demo = demo_col if use_demo else None
+    if style == "list":
+        block = _render_list(df, metric_cols, demo)
+    else:
+        block = _render_table(df, metric_cols, demo, style)
+
+    if len(_BLOCK_CACHE) >= _BLOCK_CACHE_MAX:
+        _BLOCK_CACHE.pop(next(iter(_BLOCK_CACHE)))
+    _BLOCK_CACHE[key] = block
+    return block
+
+
+# ------------------------- Config-driven design -------------------------
+
+def load_config(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def table_cache_dir(args, data_path) -> str | None:
+    if args.no_table_cache:
+        return None
+    return args.table_cache or str(Path(data_path).parent / ".table_cache")
+
+
+def config_datasets(cfg: dict, base_dir: Path, args) -> list:
+    """Dataset specs from `datasets:` in the config, else the single `data_path`/`sheet_name`."""
+    specs = cfg.get("datasets") or [{"path": cfg.get("data_path"), "sheet": cfg.get("sheet_name")}]
+    out = []
+    for spec in specs:
+        path = Path(spec["path"])
+        if not path.is_absolute():
+            path = base_dir / path
+        out.append({
+            "name": spec.get("name") or path.stem,
+            "path": str(path),
+            "sheet": spec.get("sheet", spec.get("sheet_name")),
+            "header_row": spec.get("header_row", args.header_row),
+            "skip_rows": spec.get("skip_rows", args.skip_rows),
+            "demographics_col": spec.get("demographics_col", args.demographics_col),
+            "block_style": spec.get("block_style", args.block_style),
+            "cache_dir": table_cache_dir(args, path),
+            "excel_engine": spec.get("excel_engine", args.excel_engine),
+        })
+    return out
+
+
+def level_question(prompt_base: dict, hyp: dict, level: str) -> str:
+    """Question text for one hypothesis level; `questions:` on the hypothesis overrides prompt_base."""
+    questions = hyp.get("questions") or {}
+    if level in questions:
+        return questions[level]
+    question = prompt_base.get(f"question_{level}") or prompt_base.get("question_neutral", "")
+    if hyp.get("variable") == "priming" and level != "neutral" and prompt_base.get("priming_claim"):
+        question = f"{prompt_base['priming_claim']}\n\n{question}"
+    return question
+
+
+def demographics_stub(prompt_base: dict, hyp: dict) -> str:
+    """`demographic_stub` with {{demographics_line}} filled in, for datasets without a demographics column."""
+    stub = hyp.get("demographic_stub") or prompt_base.get("demographic_stub")
+    line = hyp.get("demographics_line") or prompt_base.get("demographics_line")
+    if not stub or not line:
+        raise ValueError(
+            f"{hyp.get('code')}: the dataset has no demographics column, so the treatment level needs "
+            "prompt_base.demographic_stub and demographics_line (or set demographics_col)"
+        )
+    return re.sub(r"\{\{\s*demographics_line\s*\}\}", lambda _: line, stub)
+
+
+class DatasetContext:
+    """A cleaned dataset whose prompt blocks are rendered once and shared by every prompt."""
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        df_raw = load_table(spec["path"], spec["sheet"], spec["header_row"], spec["skip_rows"],
+                            cache_dir=spec.get("cache_dir"), engine=spec.get("excel_engine"))
+        with timed("clean_dataframe"):
+            self.df, self.num_cols = clean_dataframe(df_raw)
+        self.hash = dataset_hash(self.df)
+        self._blocks = {}
+        self._fitted = {}
+        print(f"[diagnostic] {spec['name']}: rows={len(self.df)}, numeric_metrics={len(self.num_cols)}")
+
+    def block(self, include_demo: bool) -> str:
+        if include_demo not in self._blocks:
+            self._blocks[include_demo] = format_dataset_block(
+                self.df, include_demo=include_demo, demo_col=self.spec["demographics_col"],
+                style=self.spec["block_style"],
+            )
+        return self._blocks[include_demo]
+
+    def fit(self, include_demo: bool, available: int, count, strategy: str):
+        """Block(s) for this dataset within `available` tokens; see prompt_budget.fit_blocks."""
+        key = (include_demo, available, strategy)
+        if key not in self._fitted:
+            if count(self.block(include_demo)) <= available:
+                self._fitted[key] = [(self.block(include_demo), None)]
+            else:
+                render = lambda d: format_dataset_block(
+                    d, include_demo=include_demo, demo_col=self.spec["demographics_col"],
+                    style=self.spec["block_style"],
+                )
+                self._fitted[key] = fit_blocks(self.df, render, count, available, self.num_cols, strategy)
+        return self._fitted[key]
+
+
+def expand_matrix(cfg: dict, datasets: Iterable[dict]) -> Iterator[dict]:
+    """
+    Lazily yield the full factorial design:
+    datasets x hypotheses x levels x models x samples.
+
+    Each prompt text is built once per (dataset, hypothesis, level, token
+    budget) and the same string object is shared by all of its model/sample
+    records. Blocks over a model's budget are sharded or summarized according
+    to `token_budget.strategy` in the config.
+    """
+    prompt_base = cfg.get("prompt_base") or {}
+    intro = (prompt_base.get("context_intro") or "").strip()
+    models = cfg.get("models") or [{"provider": None, "model": None}]
+    n_samples = int((cfg.get("sampling") or {}).get("n_per_prompt", 1))
+    budget_cfg = cfg.get("token_budget") or {}
+    tokenizer = budget_cfg.get("tokenizer", "regex")
+    strategy = budget_cfg.get("strategy", "shard")
+    count = functools.lru_cache(maxsize=256)(get_tokenizer(tokenizer))
+
+    for spec in datasets:
+        ds = DatasetContext(spec)
+        for hyp in cfg.get("hypotheses") or []:
+            levels = list(hyp.get("levels") or [])
+            for level in levels:
+                include_demo = hyp.get("variable") == "demographics" and level != "none"
+                question = level_question(prompt_base, hyp, level)
+                stub = None
+                if include_demo and spec["demographics_col"] not in ds.df.columns:
+                    # no column to show, so the treatment is the configured demographic line
+                    stub = demographics_stub(prompt_base, hyp)
+                    question = f"{stub}\n\n{question}"
+                    include_demo = False
+                overhead = count(f"{intro}\n\n\n\n{question}")
+                by_budget = {}
+                for m in models:
+                    budget = model_budget(m)
+                    if budget not in by_budget:
+                        prompts = []
+                        for block, shard in ds.fit(include_demo, budget - overhead, count, strategy):
+                            text = f"{intro}\n\n{block}\n\n{question}"
+                            metadata = {
+                                "variable": hyp.get("variable"),
+                                "conditions": levels,
+                                "dataset": spec["name"],
+                                "dataset_hash": ds.hash,
+                                "prompt_tokens": count(text),
+                                "token_budget": budget,
+                                "tokenizer": tokenizer,
+                            }
+                            if include_demo:
+                                metadata["demographics_col"] = spec["demographics_col"]
+                            if stub:
+                                metadata["demographic_stub"] = stub
+                            if shard:
+                                metadata["shard"] = shard
+                            prompts.append((f"{hyp['code']}::{level}::{sha(text)}", text, metadata))
+                        by_budget[budget] = prompts
+                    for prompt_id, text, metadata in by_budget[budget]:
+                        for sample_index in range(n_samples):
+                            yield {
+                                "prompt_id": prompt_id,
+                                "hypothesis": hyp["code"],
+                                "condition": level,
+                                "model_input": text,
+                                "provider": m.get("provider"),
+                                "model": m.get("model"),
+                                "temperature": m.get("temperature"),
+                                "max_tokens": m.get("max_tokens"),
+                                "sample_index": sample_index,
+                                "metadata": metadata,
+                            }
+
+
+# ------------------------- Built-in design -------------------------
+
+def build_default_records(data_path: str, args) -> list:
+    """The built-in H1–H5 design for one dataset."""
+    df_raw = load_table(data_path, args.sheet, args.header_row, args.skip_rows,
+                        cache_dir=table_cache_dir(args, data_path), engine=args.excel_engine)
+    with timed("clean_dataframe"):
+        df, num_cols = clean_dataframe(df_raw)
     print(f"[diagnostic] rows={len(df)}, numeric_metrics={len(num_cols)} -> {num_cols[:8]}")
 
     focus_metric = args.focus_metric or pick_focus_metric(num_cols)
 
-    block_no_demo = format_dataset_block(df, include_demo=False, demo_col=args.demographics_col)
-    block_with_demo = format_dataset_block(df, include_demo=True, demo_col=args.demographics_col)
+    with timed("dataset blocks"):
+        block_no_demo = format_dataset_block(df, include_demo=False, demo_col=args.demographics_col, style=args.block_style)
+        block_with_demo = format_dataset_block(df, include_demo=True, demo_col=args.demographics_col, style=args.block_style)
 
     header = "You are a performance analyst. Base your answer strictly on the data below. Quote entity labels when making recommendations."
     records = []
@@ -222,12 +564,166 @@ def main():
             "metadata": {"variable": "sentiment_frame", "conditions": ["wrong", "opportunities"]}
         })
 
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        for r in records:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-    print(f"Wrote {len(records)} prompts → {out_path}")
+    count = get_tokenizer(args.tokenizer)
+    for r in records:
+        n_tokens = count(r["model_input"])
+        r["metadata"]["prompt_tokens"] = n_tokens
+        r["metadata"]["tokenizer"] = args.tokenizer
+        if args.token_budget and n_tokens > args.token_budget:
+            print(f"[warning] {r['prompt_id']} uses {n_tokens} tokens (budget {args.token_budget}); "
+                  "use --config with token_budget.strategy to shard or summarize")
+    return records
+
+
+# ------------------------- Batch mode -------------------------
+
+TABLE_SUFFIXES = (".xlsx", ".xls", ".csv")
+
+
+def batch_inputs(pattern: str) -> list:
+    """Source tables under a directory, or matching a glob pattern."""
+    p = Path(pattern)
+    if p.is_dir():
+        paths = [f for f in p.rglob("*") if f.suffix.lower() in TABLE_SUFFIXES]
+    else:
+        paths = [Path(f) for f in glob.glob(pattern, recursive=True)]
+    return sorted(str(f.resolve()) for f in paths if f.is_file() and not f.name.startswith("~$"))
+
+
+def design_params_hash(args, cfg: dict | None) -> str:
+    """Hash of every option that changes the prompts generated for a dataset."""
+    params = {
+        k: getattr(args, k) for k in (
+            "sheet", "header_row", "skip_rows", "demographics_col", "focus_metric",
+            "block_style", "tokenizer", "excel_engine", "inline_prompts",
+        )
+    }
+    params["config"] = cfg
+    return sha(json.dumps(params, sort_keys=True, default=str))
+
+
+def design_dataset(data_path: str, shard_path: str, args, cfg: dict | None, base_dir: str | None) -> int:
+    """Worker: load, clean and format one dataset, then write its prompt shard."""
+    if cfg is not None:
+        spec = dict(config_datasets({"data_path": data_path}, Path(base_dir), args)[0], sheet=args.sheet)
+        records = expand_matrix(cfg, [spec])
+    else:
+        records = build_default_records(data_path, args)
+    return write_prompt_bank(records, Path(shard_path), dedup=not args.inline_prompts)
+
+
+def run_batch(args, cfg: dict | None, base_dir: str | None):
+    """
+    Generate one prompt-bank shard per source table in a process pool.
+    manifest.json records each input's content hash so unchanged inputs are
+    skipped on re-runs.
+    """
+    inputs = batch_inputs(args.batch)
+    if not inputs:
+        raise SystemExit(f"No {'/'.join(TABLE_SUFFIXES)} files match {args.batch}")
+    out_dir = Path(args.out or "prompts/shards")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / "manifest.json"
+    old = {}
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old = json.load(f).get("datasets", {})
+
+    params_hash = design_params_hash(args, cfg)
+    entries, todo = {}, []
+    for path in inputs:
+        entry = {
+            "input_hash": file_hash(path),
+            "params_hash": params_hash,
+            "shard": f"{Path(path).stem}-{sha(path)}.jsonl",
+        }
+        prev = old.get(path, {})
+        if (not args.force and prev.get("input_hash") == entry["input_hash"]
+                and prev.get("params_hash") == params_hash and (out_dir / entry["shard"]).exists()):
+            entries[path] = prev
+        else:
+            entries[path] = entry
+            todo.append(path)
+    print(f"[batch] {len(inputs)} datasets, {len(inputs) - len(todo)} unchanged, {len(todo)} to generate")
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(design_dataset, path, str(out_dir / entries[path]["shard"]), args, cfg, base_dir): path
+            for path in todo
+        }
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                entries[path]["prompts"] = fut.result()
+                print(f"[batch] {Path(path).name}: {entries[path]['prompts']} prompts")
+            except Exception as e:
+                failed.append(path)
+                entries.pop(path)
+                print(f"[batch] {Path(path).name}: FAILED ({e})")
+
+    tmp = manifest_path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"params_hash": params_hash, "datasets": entries}, f, indent=2)
+    os.replace(tmp, manifest_path)
+    total = sum(e.get("prompts", 0) for e in entries.values())
+    print(f"Wrote manifest for {len(entries)} shards ({total} prompts) → {manifest_path}")
+    if failed:
+        raise SystemExit(f"{len(failed)} dataset(s) failed")
+
+
+DEFAULT_DATA = "C:/Users/Hrush/Desktop/Semesters/OPT Research/Research Task 8/llm-bias-lab/llm-bias-lab/data/source.xlsx"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=None, help="source table (with --config: replaces the config's datasets)")
+    ap.add_argument("--sheet", default=None)
+    ap.add_argument("--out", default=None, help="prompt bank path (default: config output_paths.prompts_jsonl or prompts/prompt_bank.jsonl)")
+    ap.add_argument("--config", default=None, help="config.yml; expands hypotheses x levels x datasets x models x samples")
+    ap.add_argument("--batch", default=None, help="directory or glob of source tables; writes one shard per table plus manifest.json to --out (default prompts/shards)")
+    ap.add_argument("--workers", type=int, default=None, help="processes for --batch (default: CPU count)")
+    ap.add_argument("--force", action="store_true", help="--batch: regenerate shards even for unchanged inputs")
+    ap.add_argument("--demographics-col", default=None)
+    ap.add_argument("--focus-metric", default=None)
+    ap.add_argument("--header-row", type=int, default=None, help="0-based header row (None = infer)")
+    ap.add_argument("--skip-rows", type=int, default=0, help="rows to skip above header")
+    ap.add_argument("--table-cache", default=None, help="parsed-sheet cache dir (default: <data dir>/.table_cache)")
+    ap.add_argument("--no-table-cache", action="store_true", help="always re-read the source workbook")
+    ap.add_argument("--excel-engine", default=None, help="pandas Excel engine, or 'auto' to use calamine when installed")
+    ap.add_argument("--tokenizer", default="regex", help="token counter: regex | chars | tiktoken[:<encoding>]")
+    ap.add_argument("--token-budget", type=int, default=None, help="warn when a prompt exceeds this many tokens")
+    ap.add_argument("--block-style", choices=BLOCK_STYLES, default="list", help="dataset block layout; csv/markdown use fewer tokens")
+    ap.add_argument("--inline-prompts", action="store_true", help="write full model_input in every record instead of shared fragments")
+    instrument.add_arguments(ap)
+    args = ap.parse_args()
+    instrument.setup(args)
+
+    if args.batch:
+        cfg = load_config(args.config) if args.config else None
+        base_dir = str(Path(args.config).resolve().parent) if args.config else None
+        run_batch(args, cfg, base_dir)
+        return
+
+    if args.config:
+        cfg = load_config(args.config)
+        base_dir = Path(args.config).resolve().parent
+        out_path = Path(args.out or (cfg.get("output_paths") or {}).get("prompts_jsonl") or "prompts/prompt_bank.jsonl")
+        if args.data:  # an explicit table overrides data_path/datasets from the config
+            cfg_data = {"data_path": str(Path(args.data).resolve()), "sheet_name": args.sheet or cfg.get("sheet_name")}
+            datasets = config_datasets(cfg_data, base_dir, args)
+        else:
+            datasets = config_datasets(cfg, base_dir, args)
+        with timed("expand + write prompt bank"):
+            n = write_prompt_bank(expand_matrix(cfg, datasets), out_path, dedup=not args.inline_prompts)
+        print(f"Wrote {n} prompts → {out_path}")
+        return
+
+    records = build_default_records(args.data or DEFAULT_DATA, args)
+    out_path = Path(args.out or "prompts/prompt_bank.jsonl")
+    with timed("write prompt bank"):
+        n = write_prompt_bank(records, out_path, dedup=not args.inline_prompts)
+    print(f"Wrote {n} prompts → {out_path}")
 
 
 if __name__ == "__main__":
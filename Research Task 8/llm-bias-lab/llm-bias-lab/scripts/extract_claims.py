@@ -0,0 +1,140 @@
+"""
+extract_claims.py
+Extract "key: value" claims from model responses for validate_claims.
+
+Reads responses.jsonl (or any JSONL with `response_text` / `response`)
+in chunks of raw lines, or only the needed columns of a response store, parses and scans each chunk in a worker process
+with the linear-time scanner from validate_claims, and streams
+(example_id, key, value) claims out in input order. Claims go either to a
+CSV that validate_claims reads, or, with --truth, straight into the
+validator without touching disk.
+
+Guards against pathological input: responses are truncated to --max-chars,
+at most --max-pairs claims are kept per response, and lines that are not
+valid JSON objects are skipped and counted.
+
+Usage:
+  python scripts/extract_claims.py --input results/responses.jsonl --out results/extracted_claims.csv
+  python scripts/extract_claims.py --input results/responses.jsonl --truth data/ground_truth.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple, Union
+
+from jsonl_io import open_text
+from response_store import is_store, iter_responses
+from validate_claims import extract_key_value_pairs, run as validate
+
+MAX_CHARS = 100_000
+MAX_PAIRS = 500
+RECORD_COLUMNS = ["example_id", "prompt_id", "response_text", "response"]
+
+
+def record_claims(record: dict, max_chars: int = MAX_CHARS, max_pairs: int = MAX_PAIRS) -> List[Tuple[str, str, str]]:
+    text = record.get("response_text", record.get("response"))
+    if not isinstance(text, str):
+        return []
+    example_id = str(record.get("example_id", record.get("prompt_id", "")))
+    return [(example_id, k, v) for k, v in extract_key_value_pairs(text[:max_chars], max_pairs=max_pairs)]
+
+
+def _extract_chunk(lines: List[Union[str, dict]], max_chars: int, max_pairs: int):
+    claims, bad = [], 0
+    for line in lines:
+        if isinstance(line, dict):  # already-parsed record from a response store
+            claims.extend(record_claims(line, max_chars, max_pairs))
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            bad += 1
+            continue
+        if not isinstance(record, dict):
+            bad += 1
+            continue
+        claims.extend(record_claims(record, max_chars, max_pairs))
+    return claims, bad
+
+
+def iter_extracted_claims(path, workers: Optional[int] = None, chunk_size: int = 2000,
+                          max_chars: int = MAX_CHARS, max_pairs: int = MAX_PAIRS,
+                          stats: Optional[dict] = None) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield claims from every response in `path`, in file order. Chunks are
+    scanned on a process pool with at most 2 * workers chunks in flight, so
+    memory is bounded however large the input is.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("bad_lines", 0)
+    stats.setdefault("claims", 0)
+    workers = workers or os.cpu_count() or 1
+    with (nullcontext(iter_responses(path, RECORD_COLUMNS)) if is_store(path) else open_text(path)) as f:
+        chunks = iter(lambda: list(islice(f, chunk_size)), [])
+        if workers <= 1:
+            results = (_extract_chunk(c, max_chars, max_pairs) for c in chunks)
+            for claims, bad in results:
+                stats["bad_lines"] += bad
+                stats["claims"] += len(claims)
+                yield from claims
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_extract_chunk, chunk, max_chars, max_pairs))
+                if len(pending) >= 2 * workers:
+                    claims, bad = pending.popleft().result()
+                    stats["bad_lines"] += bad
+                    stats["claims"] += len(claims)
+                    yield from claims
+            while pending:
+                claims, bad = pending.popleft().result()
+                stats["bad_lines"] += bad
+                stats["claims"] += len(claims)
+                yield from claims
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract key: value claims from model responses.")
+    ap.add_argument("--input", default="results/responses.jsonl", help="Responses JSONL (.gz/.zst ok) or response store (.sqlite)")
+    ap.add_argument("--out", default="results/extracted_claims.csv", help="Claims CSV (example_id,key,claimed_value)")
+    ap.add_argument("--truth", default=None, help="Validate the claims against this ground truth instead of writing --out")
+    ap.add_argument("--report", default="results/report.csv", help="Validation report CSV (with --truth)")
+    ap.add_argument("--summary", default="results/summary.json", help="Validation summary JSON (with --truth)")
+    ap.add_argument("--truth-db", default=None, help="On-disk truth index for validate_claims (with --truth)")
+    ap.add_argument("--atol", type=float, default=0.0)
+    ap.add_argument("--rtol", type=float, default=0.0)
+    ap.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    ap.add_argument("--chunk-size", type=int, default=2000, help="Response lines per worker task")
+    ap.add_argument("--max-chars", type=int, default=MAX_CHARS, help="Characters scanned per response")
+    ap.add_argument("--max-pairs", type=int, default=MAX_PAIRS, help="Claims kept per response")
+    args = ap.parse_args()
+
+    stats = {}
+    claims = iter_extracted_claims(args.input, workers=args.workers, chunk_size=args.chunk_size,
+                                   max_chars=args.max_chars, max_pairs=args.max_pairs, stats=stats)
+    if args.truth:
+        summary = validate(None, args.truth, args.report, args.summary, args.atol, args.rtol,
+                           truth_db=args.truth_db, claims=claims)
+        print(f"Validated {summary['total_claims']} claims (accuracy: {summary['accuracy']})")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["example_id", "key", "claimed_value"])
+            writer.writerows(claims)
+        print(f"Wrote {stats['claims']} claims to {args.out}")
+    if stats["bad_lines"]:
+        print(f"Skipped {stats['bad_lines']} malformed lines")
+
+
+if __name__ == "__main__":
+    main()
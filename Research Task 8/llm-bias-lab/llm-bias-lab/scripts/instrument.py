@@ -0,0 +1,277 @@
+"""
+instrument.py
+Lightweight timing, memory and counter instrumentation with a JSON trace.
+
+Hot paths wrap themselves in spans and bump counters; nothing is recorded
+until a script enables tracing, so the disabled cost is one attribute check.
+
+  with span("score_texts", items=len(texts)):
+      ...
+  @traced(items=lambda rows, *a, **k: len(rows))
+  def load_csv(...): ...
+  count("cache_hits")
+
+Scripts expose it through add_arguments()/setup():
+  --trace trace.json     write spans (calls, total/mean/max seconds, items/s),
+                         counters, wall/CPU time and peak RSS at exit
+  --trace-memory         also track Python allocations with tracemalloc (slow)
+  --profile out.prof     cProfile the run (pstats format); a .html path uses
+                         pyinstrument when it is installed
+
+Traces from two runs can be compared with:
+  python scripts/instrument.py diff before.json after.json
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from pyinstrument import Profiler as _PyinstrumentProfiler
+except ImportError:
+    _PyinstrumentProfiler = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "items", "start")
+
+    def __init__(self, tracer, name, items):
+        self.tracer, self.name, self.items = tracer, name, items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, time.perf_counter() - self.start, self.items)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ("items",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class Tracer:
+    """Aggregates span timings and counters; thread-safe."""
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._started = datetime.now(timezone.utc)
+
+    def span(self, name: str, items: Optional[int] = None):
+        """Time a block; set `.items` on the returned span if the size is only known inside."""
+        if not self.enabled:
+            return _NULL
+        return _Span(self, name, items)
+
+    def record(self, name: str, seconds: float, items: Optional[int] = None):
+        with self._lock:
+            s = self.spans.get(name)
+            if s is None:
+                s = self.spans[name] = {"calls": 0, "total_s": 0.0, "max_s": 0.0, "items": 0}
+            s["calls"] += 1
+            s["total_s"] += seconds
+            if seconds > s["max_s"]:
+                s["max_s"] = seconds
+            if items:
+                s["items"] += items
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def report(self) -> dict:
+        wall = time.perf_counter() - self._wall0
+        rss = peak_rss_mb()
+        spans = {}
+        for name, s in sorted(self.spans.items(), key=lambda kv: -kv[1]["total_s"]):
+            out = {"calls": s["calls"], "total_s": round(s["total_s"], 6),
+                   "mean_s": round(s["total_s"] / s["calls"], 6), "max_s": round(s["max_s"], 6)}
+            if s["items"]:
+                out["items"] = s["items"]
+                out["items_per_s"] = round(s["items"] / s["total_s"], 1) if s["total_s"] else None
+            spans[name] = out
+        trace = {
+            "script": os.path.basename(sys.argv[0]),
+            "argv": sys.argv[1:],
+            "started": self._started.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "wall_s": round(wall, 3),
+            "cpu_s": round(time.process_time() - self._cpu0, 3),
+            "peak_rss_mb": round(rss, 1) if rss is not None else None,
+            "spans": spans,
+            "counters": dict(sorted(self.counters.items())),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            trace["tracemalloc_current_mb"] = round(current / 2**20, 1)
+            trace["tracemalloc_peak_mb"] = round(peak / 2**20, 1)
+        return trace
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+TRACER = Tracer()
+span = TRACER.span
+count = TRACER.count
+
+
+def traced(name: Optional[str] = None, items: Optional[Callable] = None):
+    """
+    Decorator form of span(). `items(result, *args, **kwargs)` gives the
+    number of rows/records the call handled, for throughput.
+    """
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            TRACER.record(label, time.perf_counter() - t0,
+                          items(result, *args, **kwargs) if items else None)
+            return result
+        return inner
+    return wrap
+
+
+def enable(trace_path: Optional[str] = None, memory: bool = False, profile: Optional[str] = None):
+    """Start recording; the trace and profile are written when the process exits."""
+    TRACER.enabled = True
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    profiler = None
+    if profile:
+        if profile.endswith(".html") and _PyinstrumentProfiler is not None:
+            profiler = _PyinstrumentProfiler()
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+    def finish():
+        if profiler is not None:
+            if _PyinstrumentProfiler is not None and isinstance(profiler, _PyinstrumentProfiler):
+                profiler.stop()
+                with open(profile, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            else:
+                profiler.disable()
+                profiler.dump_stats(profile)
+            print(f"[instrument] profile written to {profile}", file=sys.stderr)
+        if trace_path:
+            TRACER.write(trace_path)
+            print(f"[instrument] trace written to {trace_path}", file=sys.stderr)
+    atexit.register(finish)
+
+
+def add_arguments(ap: argparse.ArgumentParser):
+    ap.add_argument("--trace", default=None, help="write a JSON timing/memory trace here at exit")
+    ap.add_argument("--trace-memory", action="store_true", help="track allocations with tracemalloc (slower)")
+    ap.add_argument("--profile", default=None, help="cProfile output (.prof), or .html for pyinstrument")
+
+
+def setup(args):
+    if args.trace or args.profile or args.trace_memory:
+        enable(args.trace, memory=args.trace_memory, profile=args.profile)
+
+
+# ------------------------- Trace diff -------------------------
+
+def _fmt_change(old, new):
+    if old in (None, 0) or new is None:
+        return ""
+    return f"{(new - old) / old:+.0%}"
+
+
+def diff(old: dict, new: dict) -> str:
+    lines = [f"{'':<36}{'before':>12}{'after':>12}{'change':>9}"]
+    for key in ("wall_s", "cpu_s", "peak_rss_mb", "tracemalloc_peak_mb"):
+        if key in old or key in new:
+            a, b = old.get(key), new.get(key)
+            lines.append(f"{key:<36}{a if a is not None else '-':>12}{b if b is not None else '-':>12}{_fmt_change(a, b):>9}")
+    names = list(new.get("spans", {})) + [n for n in old.get("spans", {}) if n not in new.get("spans", {})]
+    if names:
+        lines.append("\nspan total_s (calls)")
+    for n in names:
+        a, b = old.get("spans", {}).get(n), new.get("spans", {}).get(n)
+        fa = f"{a['total_s']:.3f} ({a['calls']})" if a else "-"
+        fb = f"{b['total_s']:.3f} ({b['calls']})" if b else "-"
+        lines.append(f"{n[:36]:<36}{fa:>12}{fb:>12}{_fmt_change(a and a['total_s'], b and b['total_s']):>9}")
+    counters = sorted(set(old.get("counters", {})) | set(new.get("counters", {})))
+    if counters:
+        lines.append("\ncounters")
+    for n in counters:
+        a, b = old.get("counters", {}).get(n), new.get("counters", {}).get(n)
+        lines.append(f"{n[:36]:<36}{a if a is not None else '-':>12}{b if b is not None else '-':>12}{_fmt_change(a, b):>9}")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare two instrument traces.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("diff")
+    d.add_argument("before")
+    d.add_argument("after")
+    args = ap.parse_args()
+    with open(args.before, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        new = json.load(f)
+    print(diff(old, new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+jsonl_io.py
+JSONL reading/writing helpers shared by the experiment scripts.
+
+JSONLWriter moves serialization and disk I/O onto a background thread:
+records are queued, grouped into batches (by count or elapsed time) and
+appended with one write + fsync per batch. Paths ending in .gz or .zst are
+written compressed, one gzip member / zstd frame per batch, so every
+flushed batch is independently readable even if the process dies later.
+"""
+
+import gzip
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+def detect_compression(path) -> Optional[str]:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".gz":
+        return "gzip"
+    if suffix in (".zst", ".zstd"):
+        return "zstd"
+    return None
+
+
+def open_text(path, compression: Optional[str] = "auto"):
+    """Open a (possibly compressed) text file for reading."""
+    if compression == "auto":
+        compression = detect_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required to read .zst files (pip install zstandard)")
+        raw = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_jsonl(path) -> Iterator[dict]:
+    with open_text(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _FlushMarker:
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+_STOP = object()
+
+
+class JSONLWriter:
+    """
+    Background, batched JSONL appender.
+
+    write() only enqueues; a record is durable (written and fsynced) once a
+    later flush() or close() returns. The queue is bounded so producers get
+    back-pressure instead of unbounded memory growth.
+    """
+
+    def __init__(self, path, compression: Optional[str] = "auto", batch_size: int = 1000,
+                 flush_interval: float = 0.5, fsync: bool = True, max_queue: int = 100_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression = detect_compression(self.path) if compression == "auto" else compression
+        if self.compression == "zstd":
+            if zstandard is None:
+                raise ImportError("zstandard is required for .zst output (pip install zstandard)")
+            self._zstd = zstandard.ZstdCompressor(level=3)
+        elif self.compression not in (None, "gzip"):
+            raise ValueError(f"Unsupported compression: {self.compression}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.written = 0
+        self._error: Optional[BaseException] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._file = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+        self._thread.start()
+
+    # -- producer side --
+
+    def write(self, record: dict):
+        self._raise_if_failed()
+        self._queue.put(record)
+
+    def flush(self):
+        """Block until every record written so far is on disk."""
+        self._raise_if_failed()
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        marker.event.wait()
+        self._raise_if_failed()
+
+    def close(self):
+        """Stop the writer and close the file; a writer error is raised, or printed if another is in flight."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
+        if self._error is not None and sys.exc_info()[1] is not None:
+            print(f"JSONL writer for {self.path} failed: {self._error!r}", file=sys.stderr)
+            return
+        self._raise_if_failed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f"JSONL writer for {self.path} failed") from self._error
+
+    # -- writer thread --
+
+    def _encode(self, lines) -> bytes:
+        data = "".join(lines).encode("utf-8")
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=6)
+        if self.compression == "zstd":
+            return self._zstd.compress(data)
+        return data
+
+    def _commit(self, lines):
+        if lines:
+            self._file.write(self._encode(lines))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.written += len(lines)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            lines, markers = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _FlushMarker):
+                    markers.append(item)
+                    break
+                if self._error is None:
+                    try:
+                        lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+                    except (TypeError, ValueError) as e:
+                        self._error = e
+                if len(lines) >= self.batch_size:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if self._error is None:
+                try:
+                    self._commit(lines)
+                except BaseException as e:  # surfaced to producers on next call
+                    self._error = e
+            for m in markers:
+                m.event.set()
@@ -0,0 +1,148 @@
+"""
+latency_report.py
+Per-model / per-hypothesis latency and token report from responses.jsonl.
+
+Streams the responses once and keeps a small log-bucketed quantile sketch per
+group and metric (relative error ~1%, memory independent of the record
+count), so p50/p95/p99 are available for runs of any size. Cache hits are
+counted but excluded from latency and throughput, since no call was made.
+
+Metrics: latency_s, ttft_s, tokens_per_s (output tokens / latency) plus
+input/output token and retry totals. Every model also gets an "ALL" row
+across its hypotheses.
+
+Usage:
+  python scripts/latency_report.py --input results/responses.jsonl --out analysis/latency_report.csv
+"""
+
+import argparse
+import math
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from response_store import iter_responses
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRICS = ("latency_s", "ttft_s", "tokens_per_s")
+RECORD_COLUMNS = ["model", "hypothesis", "latency_s", "ttft_s", "input_tokens", "output_tokens", "retries", "cached"]
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles with bounded relative error: values are counted in
+    logarithmic buckets of width (1 + rel_err) / (1 - rel_err), and a
+    quantile is read back as the midpoint of the bucket that holds its rank.
+    """
+
+    def __init__(self, rel_err: float = 0.01):
+        self.gamma = (1 + rel_err) / (1 - rel_err)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = defaultdict(int)
+        self.zeros = 0
+        self.n = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float):
+        self.n += 1
+        self.total += x
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        if x <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(x) / self._log_gamma)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.n:
+            return None
+        rank = q * (self.n - 1)
+        seen = self.zeros
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.n if self.n else None
+
+
+class GroupStats:
+    def __init__(self, rel_err: float):
+        self.calls = 0
+        self.cached = 0
+        self.retries = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.sketches = {m: QuantileSketch(rel_err) for m in METRICS}
+
+    def add(self, r: dict):
+        self.calls += 1
+        self.retries += r.get("retries") or 0
+        self.input_tokens += r.get("input_tokens") or 0
+        self.output_tokens += r.get("output_tokens") or 0
+        if r.get("cached"):
+            self.cached += 1
+            return
+        latency, ttft = r.get("latency_s"), r.get("ttft_s")
+        if latency is not None:
+            self.sketches["latency_s"].add(latency)
+            if latency > 0 and r.get("output_tokens") is not None:
+                self.sketches["tokens_per_s"].add(r["output_tokens"] / latency)
+        if ttft is not None:
+            self.sketches["ttft_s"].add(ttft)
+
+    def row(self) -> dict:
+        out = {"calls": self.calls, "cached": self.cached, "retries": self.retries,
+               "input_tokens": self.input_tokens, "output_tokens": self.output_tokens}
+        for m, sk in self.sketches.items():
+            out[f"{m}_mean"] = sk.mean
+            for q in QUANTILES:
+                out[f"{m}_p{int(q * 100)}"] = sk.quantile(q)
+            out[f"{m}_max"] = sk.max if sk.n else None
+        return out
+
+
+def latency_report(path, rel_err: float = 0.01) -> pd.DataFrame:
+    groups = defaultdict(lambda: GroupStats(rel_err))
+    for r in iter_responses(path, RECORD_COLUMNS):
+        model = r.get("model")
+        groups[(model, r.get("hypothesis"))].add(r)
+        groups[(model, "ALL")].add(r)
+    rows = [{"model": m, "hypothesis": h, **g.row()} for (m, h), g in groups.items()]
+    if not rows:
+        return pd.DataFrame(columns=["model", "hypothesis"])
+    df = pd.DataFrame(rows)
+    df["_all"] = df["hypothesis"].eq("ALL")
+    df = df.sort_values(["model", "_all", "hypothesis"], na_position="last").drop(columns="_all")
+    return df.round(4).reset_index(drop=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency percentiles and token throughput per model and hypothesis.")
+    ap.add_argument("--input", default="results/responses.jsonl", help="Responses JSONL (.gz/.zst ok) or response store (.sqlite)")
+    ap.add_argument("--out", default="analysis/latency_report.csv")
+    ap.add_argument("--rel-err", type=float, default=0.01, help="Relative error of the percentile sketch")
+    args = ap.parse_args()
+
+    df = latency_report(args.input, rel_err=args.rel_err)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(args.out, index=False)
+    cols = ["model", "hypothesis", "calls", "cached", "latency_s_p50", "latency_s_p95", "latency_s_p99",
+            "ttft_s_p50", "tokens_per_s_p50", "output_tokens", "retries"]
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(df[[c for c in cols if c in df.columns]].to_string(index=False))
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
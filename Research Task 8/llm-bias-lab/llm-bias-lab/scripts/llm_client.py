@@ -0,0 +1,213 @@
+"""
+llm_client.py
+Minimal HTTP client for OpenAI-, Anthropic- and Google-style generation APIs.
+
+Standard library only (urllib). Responses are streamed (server-sent events)
+so time to first token can be measured; 429/5xx responses and connection
+errors are retried with exponential backoff and jitter, honouring
+Retry-After. Point it at the real providers or at mock_provider.py.
+
+  client = LLMClient("http://127.0.0.1:8800")
+  text, usage = client.complete("anthropic", "claude-3-5-sonnet-20241022", prompt, timer=timer)
+
+API keys are read from OPENAI_API_KEY / ANTHROPIC_API_KEY / GOOGLE_API_KEY
+when present.
+"""
+
+import http.client
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+PROVIDERS = ("openai", "anthropic", "google")
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+KEY_ENV = {"openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY", "google": "GOOGLE_API_KEY"}
+
+
+class LLMError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def build_request(provider: str, base_url: str, model: str, prompt: str, temperature=None,
+                  max_tokens=None, seed=None, stream: bool = True, api_key: Optional[str] = None):
+    """(url, headers, body) for one single-turn generation request."""
+    base = base_url.rstrip("/")
+    headers = {"Content-Type": "application/json"}
+    if provider == "openai":
+        url = f"{base}/v1/chat/completions"
+        body = {"model": model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+        if stream:
+            body["stream_options"] = {"include_usage": True}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if max_tokens is not None:
+            body["max_tokens"] = max_tokens
+        if seed is not None:
+            body["seed"] = seed
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+    elif provider == "anthropic":
+        url = f"{base}/v1/messages"
+        body = {"model": model, "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens or 1024, "stream": stream}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if seed is not None:
+            body["metadata"] = {"user_id": f"sample-{seed}"}
+        headers["anthropic-version"] = "2023-06-01"
+        if api_key:
+            headers["x-api-key"] = api_key
+    elif provider == "google":
+        action = "streamGenerateContent?alt=sse" if stream else "generateContent"
+        url = f"{base}/v1beta/models/{model}:{action}"
+        config = {}
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens is not None:
+            config["maxOutputTokens"] = max_tokens
+        if seed is not None:
+            config["seed"] = seed
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if config:
+            body["generationConfig"] = config
+        if api_key:
+            headers["x-goog-api-key"] = api_key
+    else:
+        raise ValueError(f"Unknown provider: {provider} (expected one of {PROVIDERS})")
+    return url, headers, json.dumps(body).encode("utf-8")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date); None if absent or unreadable."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _usage(provider: str, event: dict, usage: dict):
+    """Fold token counts from a response or stream event into `usage`."""
+    if provider == "openai" and event.get("usage"):
+        usage["input_tokens"] = event["usage"].get("prompt_tokens")
+        usage["output_tokens"] = event["usage"].get("completion_tokens")
+    elif provider == "anthropic":
+        u = event.get("usage") or (event.get("message") or {}).get("usage") or {}
+        if "input_tokens" in u:
+            usage["input_tokens"] = u["input_tokens"]
+        if "output_tokens" in u:
+            usage["output_tokens"] = u["output_tokens"]
+    elif provider == "google" and event.get("usageMetadata"):
+        usage["input_tokens"] = event["usageMetadata"].get("promptTokenCount")
+        usage["output_tokens"] = event["usageMetadata"].get("candidatesTokenCount")
+
+
+def _text(provider: str, event: dict, streamed: bool) -> str:
+    if provider == "openai":
+        choices = event.get("choices") or [{}]
+        part = choices[0].get("delta" if streamed else "message") or {}
+        return part.get("content") or ""
+    if provider == "anthropic":
+        if streamed:
+            delta = event.get("delta") or {}
+            return delta.get("text", "") if event.get("type") == "content_block_delta" else ""
+        return "".join(b.get("text", "") for b in event.get("content") or [] if b.get("type") == "text")
+    candidates = event.get("candidates") or [{}]
+    return "".join(p.get("text", "") for p in (candidates[0].get("content") or {}).get("parts") or [])
+
+
+def parse_stream(provider: str, lines, timer=None) -> Tuple[str, dict]:
+    """Text and usage from an SSE byte-line iterator; marks the first token on `timer`."""
+    pieces, usage = [], {}
+    for raw in lines:
+        line = raw.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        event = json.loads(data)
+        if event.get("type") == "error" or "error" in event:
+            raise LLMError(f"stream error: {event.get('error')}")
+        text = _text(provider, event, streamed=True)
+        if text:
+            if timer is not None:
+                timer.first_token()
+            pieces.append(text)
+        _usage(provider, event, usage)
+    return "".join(pieces), usage
+
+
+class LLMClient:
+    def __init__(self, base_url: str, timeout: float = 120.0, max_retries: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 30.0, stream: bool = True, api_keys: Optional[dict] = None,
+                 seed: Optional[int] = None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stream = stream
+        self.api_keys = api_keys if api_keys is not None else {p: os.environ.get(env) for p, env in KEY_ENV.items()}
+        self._rng = random.Random(seed)
+
+    def _once(self, provider, model, prompt, temperature, max_tokens, seed, timer):
+        url, headers, body = build_request(provider, self.base_url, model, prompt, temperature, max_tokens,
+                                           seed, self.stream, self.api_keys.get(provider))
+        req = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                if self.stream:
+                    return parse_stream(provider, resp, timer)
+                event = json.loads(resp.read())
+                usage = {}
+                _usage(provider, event, usage)
+                return _text(provider, event, streamed=False), usage
+        except urllib.error.HTTPError as e:
+            retry_after = parse_retry_after(e.headers.get("Retry-After") if e.headers else None)
+            try:
+                detail = e.read()[:300].decode("utf-8", "replace")
+            except (OSError, http.client.HTTPException):
+                detail = e.reason
+            raise LLMError(f"HTTP {e.code} from {url}: {detail}", status=e.code, retry_after=retry_after) from e
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            # URLError, timeouts, resets, IncompleteRead, truncated or garbled JSON: all retryable
+            raise LLMError(f"{type(e).__name__} calling {url}: {e}") from e
+
+    def complete(self, provider: str, model: str, prompt: str, temperature=None, max_tokens=None,
+                 seed=None, timer=None) -> Tuple[str, dict]:
+        """
+        Generated text and {"input_tokens", "output_tokens"} as reported by the
+        provider. Retries (counted on timer.retries) before raising LLMError.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._once(provider, model, prompt, temperature, max_tokens, seed, timer)
+            except LLMError as e:
+                retryable = e.status is None or e.status in RETRY_STATUS
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else \
+                    min(self.max_backoff, self.backoff * 2 ** attempt) * (0.5 + self._rng.random())
+                attempt += 1
+                if timer is not None:
+                    timer.retries += 1
+                time.sleep(delay)
@@ -0,0 +1,202 @@
+"""
+manual_batch.py
+Work files for collecting model responses by hand, in two phases.
+
+Phase one (run_experiment.py --manual) writes every pending job -- one
+prompt x model x sample -- to a work file that people fill in at their own
+pace. The format is chosen by the --work path:
+
+  results/manual/          directory: one markdown file per job
+  results/manual.md        one markdown document, a section per job
+  results/manual.csv/.xlsx one row per job with an empty response_text column
+
+--split N writes N work files (…_part1 … _partN) to hand out. Existing work
+files are never overwritten unless asked to (they may hold pasted answers).
+
+Markdown sections look like
+
+  <!-- job: {"prompt_id": "...", "model": "gpt-4o", "sample_index": 0} -->
+  ## H1_framing | positive — gpt-4o, sample 0
+  ...prompt...
+  <!-- response: paste below, keep the end marker -->
+  <the pasted response>
+  <!-- end -->
+
+Phase two (run_experiment.py --import-responses FILES...) reads any mix of
+these files back. read_work() yields the filled-in rows, and collect()
+checks them against the prompt bank and the responses already logged.
+"""
+
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+
+JOB_MARK = "<!-- job: "
+RESPONSE_MARK = "<!-- response: paste below, keep the end marker -->"
+END_MARK = "<!-- end -->"
+SHEET_COLUMNS = ["prompt_id", "model", "sample_index", "hypothesis", "condition", "prompt_text", "response_text"]
+EXCEL_CELL_LIMIT = 32767
+
+_JOB_RE = re.compile(r"^<!-- job: (\{.*\}) -->$", re.M)
+
+JobKey = Tuple[str, str, int]
+
+
+def job_key(prompt_id, model, sample_index) -> JobKey:
+    return str(prompt_id), str(model), int(sample_index)
+
+
+def work_format(path) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix in (".md", ".markdown"):
+        return "md"
+    if suffix in (".csv", ".xlsx"):
+        return suffix[1:]
+    if suffix:
+        raise ValueError(f"Unsupported work file {path} (use a directory, .md, .csv or .xlsx)")
+    return "files"
+
+
+def _section(prompt: dict, model: str, sample_index: int) -> str:
+    header = json.dumps({"prompt_id": prompt["prompt_id"], "model": model, "sample_index": sample_index},
+                        ensure_ascii=False)
+    return (f"{JOB_MARK}{header} -->\n"
+            f"## {prompt['hypothesis']} | {prompt['condition']} — {model}, sample {sample_index}\n\n"
+            f"{prompt['model_input']}\n\n"
+            f"{RESPONSE_MARK}\n\n\n{END_MARK}\n")
+
+
+def _safe(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+
+
+def _exists(path: Path, fmt: str) -> bool:
+    if fmt == "files":
+        return path.is_dir() and any(path.glob("*.md"))
+    return path.exists()
+
+
+def _write_one(jobs: List[tuple], path: Path, fmt: str):
+    if fmt == "files":
+        path.mkdir(parents=True, exist_ok=True)
+        for old in path.glob("*.md"):  # only reached with overwrite=True
+            old.unlink()
+        for i, (prompt, model, sample_index) in enumerate(jobs, 1):
+            name = f"{i:05d}_{_safe(prompt['prompt_id'])}_{_safe(model)}_s{sample_index}.md"
+            (path / name).write_text(_section(prompt, model, sample_index), encoding="utf-8")
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "md":
+        path.write_text("\n".join(_section(*job) for job in jobs), encoding="utf-8")
+        return
+    rows = [{"prompt_id": p["prompt_id"], "model": m, "sample_index": s, "hypothesis": p["hypothesis"],
+             "condition": p["condition"], "prompt_text": p["model_input"], "response_text": ""}
+            for p, m, s in jobs]
+    df = pd.DataFrame(rows, columns=SHEET_COLUMNS)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+    too_long = df["prompt_text"].str.len() > EXCEL_CELL_LIMIT
+    if too_long.any():
+        raise ValueError(f"{int(too_long.sum())} prompt(s) exceed Excel's {EXCEL_CELL_LIMIT}-character cell limit; "
+                         "use a .md, .csv or directory work file instead")
+    df.to_excel(path, index=False)
+
+
+def write_work(jobs: Iterable[tuple], path, split: int = 1, overwrite: bool = False) -> List[Path]:
+    """
+    Write (prompt, model, sample_index) jobs to one work file, or to `split`
+    contiguous parts. Returns the paths written. Raises FileExistsError,
+    before writing anything, if a target exists and `overwrite` is False.
+    """
+    jobs = list(jobs)
+    path = Path(path)
+    fmt = work_format(path)
+    split = max(1, min(split, len(jobs) or 1))
+    if split == 1:
+        targets = [path]
+    else:
+        targets = [path.with_name(f"{path.stem}_part{i + 1}{path.suffix}") for i in range(split)]
+    existing = [p for p in targets if _exists(p, fmt)]
+    if existing and not overwrite:
+        raise FileExistsError(f"work file(s) already exist: {', '.join(map(str, existing))}")
+    size = math.ceil(len(jobs) / split)
+    for i, target in enumerate(targets):
+        _write_one(jobs[i * size:(i + 1) * size], target, fmt)
+    return targets
+
+
+def _read_markdown(text: str, source: str) -> Iterator[dict]:
+    starts = list(_JOB_RE.finditer(text))
+    for i, m in enumerate(starts):
+        section = text[m.end():starts[i + 1].start() if i + 1 < len(starts) else len(text)]
+        head = json.loads(m.group(1))
+        _, found, rest = section.partition(RESPONSE_MARK)
+        response = rest.split(END_MARK, 1)[0] if found else ""
+        yield {**head, "response_text": response.strip(), "source": source}
+
+
+def _read_sheet(df: pd.DataFrame, source: str) -> Iterator[dict]:
+    missing = {"prompt_id", "model", "sample_index", "response_text"} - set(df.columns)
+    if missing:
+        raise ValueError(f"{source}: missing column(s) {sorted(missing)}")
+    for r in df[["prompt_id", "model", "sample_index", "response_text"]].itertuples(index=False):
+        yield {"prompt_id": r.prompt_id, "model": r.model, "sample_index": r.sample_index,
+               "response_text": str(r.response_text).replace("\r\n", "\n").strip(), "source": source}
+
+
+def read_work(paths: Iterable) -> Iterator[dict]:
+    """Rows ({prompt_id, model, sample_index, response_text, source}) from work files or directories."""
+    for p in map(Path, paths):
+        if p.is_dir():
+            yield from read_work(sorted(p.rglob("*.md")))
+            continue
+        fmt = work_format(p)
+        if fmt == "md":
+            yield from _read_markdown(p.read_text(encoding="utf-8"), str(p))
+        elif fmt == "csv":
+            yield from _read_sheet(pd.read_csv(p, dtype=str, keep_default_na=False), str(p))
+        elif fmt == "xlsx":
+            yield from _read_sheet(pd.read_excel(p, dtype=str, keep_default_na=False), str(p))
+        else:
+            raise ValueError(f"No such work file: {p}")
+
+
+def collect(rows: Iterable[dict], expected: Dict[JobKey, object], logged: set):
+    """
+    Validate and dedup filled-in rows. Returns ({job: response_text}, Counter
+    of skip reasons, [problem messages]). The first response for a job wins;
+    a different response for it later is reported as a conflict.
+    """
+    accepted: Dict[JobKey, str] = {}
+    skipped: Counter = Counter()
+    problems: List[str] = []
+    for row in rows:
+        try:
+            key = job_key(row["prompt_id"], row["model"], row["sample_index"])
+        except (KeyError, TypeError, ValueError):
+            skipped["malformed"] += 1
+            problems.append(f"{row.get('source')}: malformed job {row}")
+            continue
+        text = row["response_text"]
+        if not text:
+            skipped["blank"] += 1
+        elif key not in expected:
+            skipped["unknown_job"] += 1
+            problems.append(f"{row['source']}: {key} is not in the prompt bank")
+        elif key in logged:
+            skipped["already_logged"] += 1
+        elif key in accepted:
+            if accepted[key] == text:
+                skipped["duplicate"] += 1
+            else:
+                skipped["conflict"] += 1
+                problems.append(f"{row['source']}: second, different response for {key} ignored")
+        else:
+            accepted[key] = text
+    return accepted, skipped, problems
@@ -0,0 +1,359 @@
+"""
+mock_provider.py
+Offline mock of the OpenAI / Anthropic / Google generation endpoints, for
+load-testing run_experiment without network access.
+
+Serves, on localhost:
+  POST /v1/chat/completions                           (OpenAI chat completions)
+  POST /v1/messages                                   (Anthropic messages)
+  POST /v1beta/models/<model>:generateContent         (Google Gemini)
+  POST /v1beta/models/<model>:streamGenerateContent   (?alt=sse)
+both plain and streamed (SSE), with provider-shaped bodies and usage counts.
+
+Behaviour knobs:
+  --ttft-ms / --ttft-sigma   log-normal time to first token (median, sigma)
+  --tokens-per-s             streaming speed after the first token
+  --error-rate               share of requests answered 500/503
+  --rate-429                 share answered 429 with Retry-After
+  --max-inflight             more concurrent requests than this also get 429
+  --template / --responses   response text: a template filled from the prompt
+                             ({entity}, {other_entity}, {metric}, {value},
+                             {model}, {n}) or canned responses separated by
+                             lines of "---"; the choice is a hash of (model,
+                             prompt, seed), so the same request always gets
+                             the same text
+  --config config.yml        only accept the models listed there (404 otherwise)
+
+Latency and failures draw from a seeded RNG (--seed). MockProvider can also
+run in-process on a background thread:
+
+  with MockProvider(MockSettings(rate_429=0.1)) as base_url:
+      LLMClient(base_url).complete("openai", "gpt-4o", "...")
+
+Usage:
+  python scripts/mock_provider.py --port 8800 --ttft-ms 400 --rate-429 0.05
+  python scripts/run_experiment.py --api-base http://127.0.0.1:8800 --concurrency 16 ...
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import yaml
+
+from prompt_budget import get_tokenizer
+
+DEFAULT_TEMPLATE = (
+    "Based on the table, {entity} is the strongest candidate and deserves priority. "
+    "{metric}: {value}. {other_entity} trails on most of the listed metrics and would benefit "
+    "from targeted coaching."
+)
+FILLER = ("The remaining entities sit close to the group average, so the ranking is driven mainly by "
+          "the top two rows. Sample sizes are small and the differences should be read with care.").split()
+
+_ENTITY_RE = re.compile(r"\bEntity [A-Z]{1,3}\b")
+_METRIC_RE = re.compile(r"^\s*-\s*([^:\n]+):\s*([-+]?\d[\d.,]*)\s*$", re.M)
+
+
+@dataclass
+class MockSettings:
+    ttft_ms: float = 300.0
+    ttft_sigma: float = 0.5
+    tokens_per_s: float = 80.0
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    retry_after: float = 1.0
+    max_inflight: Optional[int] = None
+    template: str = DEFAULT_TEMPLATE
+    responses: List[str] = field(default_factory=list)
+    words: int = 60
+    chunk_words: int = 4
+    models: Optional[set] = None
+    seed: int = 0
+
+
+def render_response(settings: MockSettings, model: str, prompt: str, seed) -> str:
+    """Deterministic response text for a request."""
+    h = int.from_bytes(hashlib.sha256(f"{model}|{seed}|{prompt}".encode("utf-8")).digest()[:8], "big")
+    if settings.responses:
+        return settings.responses[h % len(settings.responses)]
+    entities = list(dict.fromkeys(_ENTITY_RE.findall(prompt))) or ["Entity A", "Entity B"]
+    entity = entities[h % len(entities)]
+    other = entities[(h // 7 + 1) % len(entities)] if len(entities) > 1 else entity
+    # a metric line from the chosen entity's section when the block is list-style
+    section = prompt[prompt.find(entity + ":"):] if entity + ":" in prompt else prompt
+    metrics = _METRIC_RE.findall(section.split("\nEntity ", 1)[0]) or _METRIC_RE.findall(prompt)
+    metric, value = metrics[(h // 13) % len(metrics)] if metrics else ("score", "1")
+    text = settings.template.format(entity=entity, other_entity=other, metric=metric.strip(),
+                                    value=value, model=model, n=h % 1000)
+    words = text.split()
+    i = h % len(FILLER)
+    while len(words) < settings.words:
+        words.append(FILLER[i % len(FILLER)])
+        i += 1
+    return " ".join(words) if len(words) > len(text.split()) else text
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockServer"
+
+    def log_message(self, fmt, *args):  # keep load tests quiet
+        pass
+
+    # -- request parsing --
+
+    def _route(self):
+        path, _, query = self.path.partition("?")
+        if path == "/v1/chat/completions":
+            return "openai", None, None
+        if path == "/v1/messages":
+            return "anthropic", None, None
+        m = re.fullmatch(r"/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)", path)
+        if m:
+            return "google", m.group(1), m.group(2) == "streamGenerateContent"
+        return None, None, None
+
+    def do_POST(self):
+        provider, g_model, g_stream = self._route()
+        if provider is None:
+            return self._error(404, "not_found", f"No route for {self.path}")
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if provider == "google":
+            model, stream = g_model, g_stream
+            prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+            seed = (body.get("generationConfig") or {}).get("seed")
+        else:
+            model, stream = body.get("model"), bool(body.get("stream"))
+            msgs = body.get("messages") or []
+            content = msgs[-1].get("content", "") if msgs else ""
+            prompt = content if isinstance(content, str) else "".join(b.get("text", "") for b in content)
+            seed = body.get("seed") if provider == "openai" else (body.get("metadata") or {}).get("user_id")
+
+        srv = self.server
+        if srv.settings.models is not None and model not in srv.settings.models:
+            return self._error(404, "model_not_found", f"Unknown model {model}", provider)
+        with srv.lock:
+            srv.stats["requests"] += 1
+            roll = srv.rng.random()
+            over = srv.settings.max_inflight is not None and srv.inflight >= srv.settings.max_inflight
+            ttft = srv.settings.ttft_ms / 1000 * math.exp(srv.rng.gauss(0, srv.settings.ttft_sigma))
+            if not over and roll >= srv.settings.rate_429 + srv.settings.error_rate:
+                srv.inflight += 1
+                admitted = True
+            else:
+                admitted = False
+        if not admitted:
+            if over or roll < srv.settings.rate_429:
+                srv.count("rate_limited")
+                return self._error(429, "rate_limit_error", "Rate limit exceeded", provider,
+                                   {"Retry-After": f"{srv.settings.retry_after:g}"})
+            srv.count("errors")
+            return self._error(503 if roll > srv.settings.rate_429 + srv.settings.error_rate / 2 else 500,
+                               "api_error", "Internal server error", provider)
+        try:
+            text = render_response(srv.settings, model, prompt, seed)
+            usage = (srv.count_tokens(prompt), srv.count_tokens(text))
+            time.sleep(ttft)
+            if stream:
+                self._stream(provider, model, text, usage)
+            else:
+                self._json(200, self._full(provider, model, text, usage))
+            srv.count("ok")
+        finally:
+            with srv.lock:
+                srv.inflight -= 1
+
+    # -- responses --
+
+    def _json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, kind, message, provider=None, headers=None):
+        if provider == "anthropic":
+            payload = {"type": "error", "error": {"type": kind, "message": message}}
+        elif provider == "google":
+            payload = {"error": {"code": status, "message": message, "status": kind.upper()}}
+        else:
+            payload = {"error": {"message": message, "type": kind, "code": status}}
+        self._json(status, payload, headers)
+
+    @staticmethod
+    def _full(provider, model, text, usage):
+        n_in, n_out = usage
+        if provider == "openai":
+            return {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": n_in, "completion_tokens": n_out, "total_tokens": n_in + n_out}}
+        if provider == "anthropic":
+            return {"id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "role": "assistant", "model": model,
+                    "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+                    "usage": {"input_tokens": n_in, "output_tokens": n_out}}
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": n_in, "candidatesTokenCount": n_out,
+                                  "totalTokenCount": n_in + n_out}}
+
+    def _stream(self, provider, model, text, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        n_in, n_out = usage
+        words = text.split(" ")
+        step = self.server.settings.chunk_words
+        chunks = [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                  for i in range(0, len(words), step)]
+        delay = step / self.server.settings.tokens_per_s if self.server.settings.tokens_per_s else 0
+        msg_id = uuid.uuid4().hex[:24]
+
+        def send(event: dict, name: Optional[str] = None):
+            if name:
+                self.wfile.write(f"event: {name}\n".encode("utf-8"))
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        if provider == "anthropic":
+            send({"type": "message_start", "message": {"id": f"msg_{msg_id}", "type": "message", "role": "assistant",
+                                                       "model": model, "content": [],
+                                                       "usage": {"input_tokens": n_in, "output_tokens": 0}}},
+                 "message_start")
+            send({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                 "content_block_start")
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(delay)
+            if provider == "openai":
+                send({"id": f"chatcmpl-{msg_id}", "object": "chat.completion.chunk", "model": model,
+                      "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]})
+            elif provider == "anthropic":
+                send({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk}},
+                     "content_block_delta")
+            else:
+                last = i == len(chunks) - 1
+                event = {"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]},
+                                         **({"finishReason": "STOP"} if last else {})}]}
+                if last:
+                    event["usageMetadata"] = {"promptTokenCount": n_in, "candidatesTokenCount": n_out,
+                                              "totalTokenCount": n_in + n_out}
+                send(event)
+        if provider == "openai":
+            send({"id": f"chatcmpl-{msg_id}", "object": "chat.completion.chunk", "model": model, "choices": [],
+                  "usage": {"prompt_tokens": n_in, "completion_tokens": n_out, "total_tokens": n_in + n_out}})
+            self.wfile.write(b"data: [DONE]\n\n")
+        elif provider == "anthropic":
+            send({"type": "content_block_stop", "index": 0}, "content_block_stop")
+            send({"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": n_out}},
+                 "message_delta")
+            send({"type": "message_stop"}, "message_stop")
+        self.wfile.flush()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, address, settings: MockSettings):
+        super().__init__(address, _Handler)
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+        self.count_tokens = get_tokenizer("regex")
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+
+class MockProvider:
+    """Run a MockServer on a background thread; the context value is its base URL."""
+
+    def __init__(self, settings: Optional[MockSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        self.server = MockServer((host, port), settings or MockSettings())
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-provider", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def load_responses(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        parts = re.split(r"^---\s*$", f.read(), flags=re.M)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local mock of OpenAI/Anthropic/Google generation endpoints.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument("--config", default=None, help="config.yml; restricts accepted models to its `models` list")
+    ap.add_argument("--ttft-ms", type=float, default=300.0, help="Median time to first token")
+    ap.add_argument("--ttft-sigma", type=float, default=0.5, help="Log-normal spread of time to first token")
+    ap.add_argument("--tokens-per-s", type=float, default=80.0, help="Streaming speed after the first token (0 = instant)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 500/503")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="Share of requests rejected with 429")
+    ap.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    ap.add_argument("--max-inflight", type=int, default=None, help="Concurrent requests above this get 429")
+    ap.add_argument("--template", default=DEFAULT_TEMPLATE, help="Response template")
+    ap.add_argument("--responses", default=None, help="File of canned responses separated by '---' lines")
+    ap.add_argument("--words", type=int, default=60, help="Pad responses with filler to about this many words")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    models = None
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        models = {m.get("model") for m in cfg.get("models") or []}
+    settings = MockSettings(
+        ttft_ms=args.ttft_ms, ttft_sigma=args.ttft_sigma, tokens_per_s=args.tokens_per_s,
+        error_rate=args.error_rate, rate_429=args.rate_429, retry_after=args.retry_after,
+        max_inflight=args.max_inflight, template=args.template,
+        responses=load_responses(args.responses) if args.responses else [],
+        words=args.words, models=models, seed=args.seed,
+    )
+    provider = MockProvider(settings, args.host, args.port)
+    print(f"Mock provider listening on {provider.base_url} (Ctrl+C to stop)")
+    try:
+        provider.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        provider.server.server_close()
+        print(f"Served: {json.dumps(provider.server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+pipeline.py
+Run design -> run -> analyze -> validate as a DAG with content-hashed caching.
+
+Each stage is one of the existing CLI scripts, run as a subprocess from the
+project root. A stage's fingerprint is the SHA-256 of its command line, the
+contents of its input files and the source of its script plus every sibling
+module it imports; it is skipped when the fingerprint matches the last run and
+its outputs are still on disk with the recorded hashes. Before a stage re-runs,
+only outputs the pipeline itself wrote (and that are unchanged since) are
+removed; anything else is left alone. Stages whose
+dependencies are done run in parallel (lexical and sentiment analysis, latency
+report, entity extraction, validation). Wall time and peak RSS per stage are printed and
+written to .pipeline/last_run.json.
+
+The "run" stage (run_experiment.py) is opt-in: it is part of the graph only
+with --api-base, and it is skipped when --responses already holds responses
+the pipeline did not write, e.g. hand-collected ones. Without it the analysis
+stages read the existing responses file.
+
+Usage:
+  python scripts/pipeline.py --data data/source.xlsx
+  python scripts/pipeline.py --config config.yml --api-base http://127.0.0.1:8800 --concurrency 16
+  python scripts/pipeline.py --stages lexical,sentiment --force
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / "scripts"
+STATE_DIR = ROOT / ".pipeline"
+DEFAULT_DATA = "data/source.xlsx"
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    args: List[str]
+    inputs: List[str]
+    outputs: List[str]
+    deps: List[str] = field(default_factory=list)
+    appends: bool = False  # the script appends to its outputs, so foreign ones must not be mixed in
+
+    def command(self) -> List[str]:
+        return [sys.executable, str(SCRIPTS / self.script)] + self.args
+
+
+def config_data_paths(config: str) -> List[str]:
+    """Source tables a config design reads: `datasets[].path`, else `data_path`, relative to the config."""
+    with open(config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    paths = [d.get("path") for d in cfg.get("datasets") or []] or [cfg.get("data_path")]
+    base = Path(config).resolve().parent
+    return [str(p if p.is_absolute() else base / p) for p in (Path(x) for x in paths if x)]
+
+
+def default_stages(args) -> List[Stage]:
+    prompts, responses = args.prompts, args.responses
+    design_args = ["--out", prompts]
+    if args.config:
+        design_args += ["--config", args.config]
+        data_inputs = [args.data] if args.data else config_data_paths(args.config)
+    else:
+        data_inputs = [args.data or DEFAULT_DATA]
+    if args.data or not args.config:
+        design_args = ["--data", data_inputs[0]] + design_args
+    stages = [
+        Stage("design", "experiment_design.py", design_args,
+              data_inputs + ([args.config] if args.config else []), [prompts]),
+    ]
+    if args.api_base:
+        run_args = ["--prompts", prompts, "--out", responses, "--api-base", args.api_base,
+                    "--provider", args.provider, "--concurrency", str(args.concurrency)]
+        if args.cache:
+            run_args += ["--cache", args.cache]
+        stages.append(Stage("run", "run_experiment.py", run_args, [prompts], [responses], ["design"], appends=True))
+    return stages + [
+        Stage("lexical", "analyze_bias.py",
+              ["--input", responses, "--outdir", args.analysis, "--only", "words", "--similarity"],
+              [responses],
+              [f"{args.analysis}/word_overlap_summary.csv", f"{args.analysis}/similarity_matrix.csv",
+               f"{args.analysis}/similarity_distribution.csv", f"{args.analysis}/near_duplicates.csv"],
+              ["run"]),
+        Stage("sentiment", "analyze_bias.py",
+              ["--input", responses, "--outdir", args.analysis, "--only", "sentiment", "--significance"],
+              [responses],
+              [f"{args.analysis}/sentiment_summary.csv", f"{args.analysis}/significance.csv"],
+              ["run"]),
+        Stage("latency", "latency_report.py",
+              ["--input", responses, "--out", f"{args.analysis}/latency_report.csv"],
+              [responses], [f"{args.analysis}/latency_report.csv"], ["run"]),
+        Stage("entities", "entity_claims.py",
+              ["--input", responses, "--claims-out", "results/entity_claims.csv",
+               "--truth-out", "results/entity_truth.csv", "--details", "results/entity_claims.jsonl"],
+              [responses],
+              ["results/entity_claims.csv", "results/entity_truth.csv", "results/entity_claims.jsonl"],
+              ["run"]),
+        Stage("validate_entities", "validate_claims.py",
+              ["--claims", "results/entity_claims.csv", "--truth", "results/entity_truth.csv",
+               "--out", "results/entity_report.csv", "--summary", "results/entity_summary.json"],
+              ["results/entity_claims.csv", "results/entity_truth.csv"],
+              ["results/entity_report.csv", "results/entity_summary.json"],
+              ["entities"]),
+        Stage("validate", "validate_claims.py",
+              ["--claims", args.claims, "--truth", args.truth,
+               "--out", "results/report.csv", "--summary", "results/summary.json"],
+              [args.claims, args.truth],
+              ["results/report.csv", "results/summary.json"]),
+    ]
+
+
+# ------------------------- Hashing -------------------------
+
+class FileHasher:
+    """SHA-256 of files, memoized on (path, size, mtime) across runs."""
+
+    def __init__(self, memo: Optional[dict] = None):
+        self.memo = memo or {}
+
+    def __call__(self, path) -> Optional[str]:
+        p = ROOT / path
+        if not p.exists():
+            return None
+        st = p.stat()
+        sig = f"{st.st_size}:{st.st_mtime_ns}"
+        hit = self.memo.get(str(path))
+        if hit and hit[0] == sig:
+            return hit[1]
+        h = hashlib.sha256()
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.memo[str(path)] = [sig, h.hexdigest()]
+        return h.hexdigest()
+
+
+def code_deps(script: str, seen=None) -> List[str]:
+    """The script plus sibling modules it imports, recursively."""
+    seen = seen if seen is not None else set()
+    if script in seen or not (SCRIPTS / script).exists():
+        return []
+    seen.add(script)
+    tree = ast.parse((SCRIPTS / script).read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        names = []
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        for name in names:
+            code_deps(f"{name.split('.')[0]}.py", seen)
+    return sorted(seen)
+
+
+def fingerprint(stage: Stage, hasher: FileHasher) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([stage.script] + stage.args).encode("utf-8"))
+    for path in stage.inputs:
+        h.update(f"{path}={hasher(path)}".encode("utf-8"))
+    for mod in code_deps(stage.script):
+        h.update(f"{mod}={hasher(f'scripts/{mod}')}".encode("utf-8"))
+    return h.hexdigest()
+
+
+# ------------------------- Execution -------------------------
+
+def run_stage(stage: Stage, log_dir: Path, owned: List[str]) -> dict:
+    """Run one stage; returns wall time, peak RSS of the child and exit code."""
+    for out in owned:  # outputs from the pipeline's own last run; e.g. run_experiment appends
+        (ROOT / out).unlink(missing_ok=True)
+    log_path = log_dir / f"{stage.name}.log"
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(stage.command(), cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        else:
+            proc.wait()
+            peak_mb = None
+    return {"wall_s": round(time.perf_counter() - start, 3), "peak_rss_mb": peak_mb and round(peak_mb, 1),
+            "returncode": proc.returncode, "log": str(log_path.relative_to(ROOT))}
+
+
+def run_pipeline(stages: List[Stage], selected: Optional[List[str]] = None, force: bool = False,
+                 workers: int = 4) -> Dict[str, dict]:
+    STATE_DIR.mkdir(exist_ok=True)
+    state_path = STATE_DIR / "state.json"
+    state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+    hasher = FileHasher(state.get("file_hashes"))
+    by_name = {s.name: s for s in stages}
+    wanted = set(selected or by_name)
+    unknown = wanted - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages: {sorted(unknown)}")
+
+    report: Dict[str, dict] = {}
+    done, failed = set(), set()
+    pending = [s for s in stages if s.name in wanted]
+
+    def ready(s):
+        deps = [d for d in s.deps if d in wanted]
+        return all(d in done for d in deps)
+
+    def blocked(s):
+        return any(d in failed for d in s.deps)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            for s in list(pending):
+                if blocked(s):
+                    pending.remove(s)
+                    failed.add(s.name)
+                    report[s.name] = {"status": "blocked"}
+                    print(f"[{s.name}] blocked by a failed dependency")
+                elif ready(s):
+                    pending.remove(s)
+                    key = fingerprint(s, hasher)
+                    prev = state.get("stages", {}).get(s.name, {})
+                    owned = [o for o in s.outputs
+                             if hasher(o) is not None and hasher(o) == prev.get("outputs", {}).get(o)]
+                    if not force and prev.get("fingerprint") == key and len(owned) == len(s.outputs):
+                        done.add(s.name)
+                        report[s.name] = {"status": "skipped"}
+                        print(f"[{s.name}] up to date, skipped")
+                        continue
+                    foreign = [o for o in s.outputs if o not in owned and hasher(o) is not None]
+                    if s.appends and foreign:
+                        done.add(s.name)
+                        report[s.name] = {"status": "kept", "outputs": foreign}
+                        print(f"[{s.name}] skipped: {', '.join(foreign)} was not written by the pipeline; "
+                              f"using it as-is (move it away to regenerate)")
+                        continue
+                    print(f"[{s.name}] running: {' '.join(s.command()[1:])}")
+                    running[pool.submit(run_stage, s, STATE_DIR, owned)] = (s, key)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                s, key = running.pop(fut)
+                res = fut.result()
+                if res["returncode"] == 0:
+                    done.add(s.name)
+                    state.setdefault("stages", {})[s.name] = {
+                        "fingerprint": key, "outputs": {o: hasher(o) for o in s.outputs}}
+                    report[s.name] = {"status": "ran", **res}
+                    print(f"[{s.name}] done in {res['wall_s']}s, peak RSS {res['peak_rss_mb']} MB")
+                else:
+                    failed.add(s.name)
+                    state.get("stages", {}).pop(s.name, None)
+                    report[s.name] = {"status": "failed", **res}
+                    print(f"[{s.name}] FAILED (exit {res['returncode']}), see {res['log']}")
+
+    state["file_hashes"] = hasher.memo
+    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    (STATE_DIR / "last_run.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the experiment pipeline, skipping stages whose inputs are unchanged.")
+    ap.add_argument("--data", default=None, help=f"Source workbook for experiment_design (default: the config's datasets, else {DEFAULT_DATA})")
+    ap.add_argument("--config", default=None, help="config.yml for a full design expansion")
+    ap.add_argument("--prompts", default="prompts/prompt_bank.jsonl")
+    ap.add_argument("--responses", default="results/responses.jsonl")
+    ap.add_argument("--api-base", default=None, help="Enables the run stage: run_experiment calls this API (or mock_provider.py)")
+    ap.add_argument("--provider", default="openai", help="run_experiment --provider for records that do not name one")
+    ap.add_argument("--concurrency", type=int, default=4, help="run_experiment API calls in flight")
+    ap.add_argument("--cache", default="results/response_cache.sqlite", help="run_experiment response cache ('' to disable)")
+    ap.add_argument("--analysis", default="analysis")
+    ap.add_argument("--claims", default="data/llm_claims.csv")
+    ap.add_argument("--truth", default="data/ground_truth.csv")
+    ap.add_argument("--stages", default=None, help="Comma-separated subset of stages to consider")
+    ap.add_argument("--force", action="store_true", help="Run selected stages even if up to date")
+    ap.add_argument("--workers", type=int, default=4, help="Stages run concurrently")
+    ap.add_argument("--list", action="store_true", help="Print the DAG and exit")
+    args = ap.parse_args()
+
+    stages = default_stages(args)
+    if args.list:
+        for s in stages:
+            print(f"{s.name:<18} <- {', '.join(s.deps) or '-':<10} {s.script} {' '.join(s.args)}")
+        return
+    selected = args.stages.split(",") if args.stages else None
+    if selected and "run" in selected and not args.api_base:
+        ap.error("the run stage needs --api-base")
+    report = run_pipeline(stages, selected, force=args.force, workers=args.workers)
+    if any(r["status"] in ("failed", "blocked") for r in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
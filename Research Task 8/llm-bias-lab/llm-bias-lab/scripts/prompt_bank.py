@@ -0,0 +1,140 @@
+"""
+prompt_bank.py
+Deduplicated prompt bank format: shared context blocks stored once.
+
+Prompts are intro + dataset block + question, and the block is the same for
+most prompts of a dataset. When writing, each model_input is split on blank
+lines; paragraphs of at least `min_chars` characters become content-addressed
+fragments, written once as
+
+  {"fragment": "<sha256[:16]>", "text": "..."}
+
+before the first prompt that uses them. The prompt record then carries
+
+  "model_input_parts": ["<intro>", {"ref": "<sha256[:16]>"}, "<question>"]
+
+and "\\n\\n".join(parts) is the original text. Banks without fragments (plain
+"model_input") load unchanged. Because the block sits in the same position in
+every prompt, the shared prefix is also what provider-side prompt caching keys
+on.
+
+iter_prompt_bank() streams records and rebuilds model_input only when it is
+first read, so tooling that looks only at ids, hypotheses or metadata never
+pays for it.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+from jsonl_io import open_text
+
+MIN_FRAGMENT_CHARS = 256
+SEP = "\n\n"
+
+
+def fragment_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def is_fragment(record: dict) -> bool:
+    return len(record) == 2 and "fragment" in record and "text" in record
+
+
+class Prompt(dict):
+    """A prompt record whose model_input is assembled from fragments on first access."""
+
+    __slots__ = ("_fragments",)
+
+    def __init__(self, record: dict, fragments: Dict[str, str]):
+        super().__init__(record)
+        self._fragments = fragments
+
+    def __missing__(self, key):
+        if key != "model_input" or "model_input_parts" not in self:
+            raise KeyError(key)
+        text = SEP.join(p if isinstance(p, str) else self._fragments[p["ref"]] for p in self["model_input_parts"])
+        self["model_input"] = text
+        return text
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def split_fragments(text: str, min_chars: int = MIN_FRAGMENT_CHARS):
+    """(parts, {id: text}) for one prompt; short neighbouring paragraphs stay one literal."""
+    parts, new = [], {}
+    for para in text.split(SEP):
+        if len(para) >= min_chars:
+            fid = fragment_id(para)
+            new[fid] = para
+            parts.append({"ref": fid})
+        elif parts and isinstance(parts[-1], str):
+            parts[-1] += SEP + para
+        else:
+            parts.append(para)
+    return parts, new
+
+
+def encode_records(records: Iterable[dict], min_chars: int = MIN_FRAGMENT_CHARS) -> Iterator[dict]:
+    """Yield fragment lines and prompt records in bank order."""
+    seen = set()
+    last_text, last_parts = None, None
+    for r in records:
+        text = r.get("model_input")
+        if not isinstance(text, str):
+            yield r
+            continue
+        if text is not last_text:  # expand_matrix shares one string across models/samples
+            parts, new = split_fragments(text, min_chars)
+            for fid, frag in new.items():
+                if fid not in seen:
+                    seen.add(fid)
+                    yield {"fragment": fid, "text": frag}
+            last_text, last_parts = text, parts
+        if not any(isinstance(p, dict) for p in last_parts):
+            yield r
+            continue
+        yield {("model_input_parts" if k == "model_input" else k): (last_parts if k == "model_input" else v)
+               for k, v in r.items()}
+
+
+def iter_prompt_bank(path) -> Iterator[Prompt]:
+    """Prompts from a bank in either format, with model_input rebuilt lazily."""
+    fragments: Dict[str, str] = {}
+    with open_text(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if is_fragment(record):
+                fragments[record["fragment"]] = record["text"]
+                continue
+            yield Prompt(record, fragments)
+
+
+def write_prompt_bank(records: Iterable[dict], out_path, dedup: bool = True) -> int:
+    """
+    Stream records to JSONL; returns the number of prompts (fragment lines excluded).
+    Written to a temp file that replaces out_path only once every record is
+    out, so a failure while building records leaves an existing bank intact.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    n = 0
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            for r in (encode_records(records) if dedup else records):
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+                if not (dedup and is_fragment(r)):
+                    n += 1
+        os.replace(tmp, out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return n
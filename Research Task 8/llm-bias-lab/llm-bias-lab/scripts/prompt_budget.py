@@ -0,0 +1,116 @@
+"""
+prompt_budget.py
+Local token counting and context-window budgeting for generated prompts.
+
+Tokenizers are pluggable by name:
+  regex             : word/number/punctuation pieces, a close stand-in for BPE counts (default)
+  chars             : len(text) / 4
+  tiktoken[:<enc>]  : exact OpenAI counts when tiktoken is installed (default enc: o200k_base)
+
+A model's prompt budget is its `context_window` minus the `max_tokens`
+reserved for the answer (both from config.yml). Tables that do not fit are
+either split into row shards or replaced by a summary-statistics block.
+"""
+
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# letters, up to 3 digits at a time (BPE vocabularies split long numbers), single punctuation
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+_TOKENIZERS: Dict[str, Callable[[str], int]] = {}
+
+
+def _regex_count(text: str) -> int:
+    return sum(1 for _ in _TOKEN_RE.finditer(text))
+
+
+def _chars_count(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def get_tokenizer(name: str = "regex") -> Callable[[str], int]:
+    """Return a text -> token count function."""
+    if name in _TOKENIZERS:
+        return _TOKENIZERS[name]
+    if name == "regex":
+        fn = _regex_count
+    elif name == "chars":
+        fn = _chars_count
+    elif name.startswith("tiktoken"):
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError("tiktoken tokenizer requested but tiktoken is not installed") from e
+        _, _, enc_name = name.partition(":")
+        enc = tiktoken.get_encoding(enc_name or "o200k_base")
+        fn = lambda text: len(enc.encode(text, disallowed_special=()))
+    else:
+        raise ValueError(f"Unknown tokenizer: {name}")
+    _TOKENIZERS[name] = fn
+    return fn
+
+
+def register_tokenizer(name: str, fn: Callable[[str], int]):
+    _TOKENIZERS[name] = fn
+
+
+def model_budget(model_cfg: dict) -> int:
+    """Prompt tokens available to a model: context window minus reserved output tokens."""
+    window = int(model_cfg.get("context_window") or DEFAULT_CONTEXT_WINDOW)
+    return window - int(model_cfg.get("max_tokens") or 0)
+
+
+def summary_block(df: pd.DataFrame, metric_cols: List[str]) -> str:
+    """Per-metric mean/min/max with the entities holding the extremes."""
+    stats = df[metric_cols].agg(["mean", "min", "max"])
+    labels = df["entity_label"]
+    lines = [f"Player statistics (anonymized summary of {len(df)} entities):"]
+    for c in metric_cols:
+        col = df[c]
+        if col.notna().sum() == 0:
+            continue
+        lo, hi = labels[col.idxmin()], labels[col.idxmax()]
+        lines.append(
+            f"  - {c}: mean={stats.at['mean', c]:.4g}, min={stats.at['min', c]:.4g} ({lo}), "
+            f"max={stats.at['max', c]:.4g} ({hi})"
+        )
+    return "\n".join(lines)
+
+
+def fit_blocks(df: pd.DataFrame, render: Callable[[pd.DataFrame], str], count: Callable[[str], int],
+               available: int, metric_cols: List[str], strategy: str = "shard") -> List[Tuple[str, Optional[dict]]]:
+    """
+    Fit a dataset block into `available` tokens.
+
+    Returns [(block_text, shard_info)]: the full block when it fits, otherwise
+    row shards (strategy="shard") or one summary block (strategy="summary").
+    shard_info is None for an unsplit block.
+    """
+    full = render(df)
+    if count(full) <= available:
+        return [(full, None)]
+
+    if strategy == "summary":
+        block = summary_block(df, metric_cols)
+        if count(block) > available:
+            raise ValueError(f"Summary block still exceeds the {available}-token budget")
+        return [(block, {"strategy": "summary", "rows": len(df)})]
+    if strategy != "shard":
+        raise ValueError(f"Unknown budget strategy: {strategy}")
+
+    header_tokens = count(render(df.iloc[:0]))
+    per_row = max((count(full) - header_tokens) / max(len(df), 1), 1.0)
+    rows_per_shard = int((available - header_tokens) // per_row)
+    while rows_per_shard >= 1:
+        shards = [render(df.iloc[i:i + rows_per_shard]) for i in range(0, len(df), rows_per_shard)]
+        if all(count(b) <= available for b in shards):
+            n = len(shards)
+            return [(b, {"strategy": "shard", "index": i, "count": n}) for i, b in enumerate(shards)]
+        rows_per_shard = int(rows_per_shard * 0.9)
+    raise ValueError(f"A single row does not fit in the {available}-token budget")
@@ -0,0 +1,124 @@
+"""
+response_cache.py
+Persistent SQLite cache of LLM responses so repeated runs and reanalysis
+do not pay for the same call twice.
+
+Entries are keyed by (prompt text hash, model, temperature, max_tokens,
+sample index). The cache is capped by entry count and evicts the least
+recently used rows once the cap is exceeded.
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key     TEXT PRIMARY KEY,
+    prompt_hash   TEXT NOT NULL,
+    model         TEXT NOT NULL,
+    temperature   REAL,
+    max_tokens    INTEGER,
+    sample_index  INTEGER NOT NULL,
+    response_text TEXT NOT NULL,
+    created_at    REAL NOT NULL,
+    last_access   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+"""
+
+
+def prompt_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(p_hash: str, model: str, temperature, max_tokens, sample_index: int) -> str:
+    raw = f"{p_hash}|{model}|{temperature}|{max_tokens}|{sample_index}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str, max_entries: Optional[int] = 100_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, text: str, model: str, temperature=None, max_tokens=None, sample_index: int = 0) -> Optional[str]:
+        key = make_key(prompt_hash(text), model, temperature, max_tokens, sample_index)
+        row = self.conn.execute(
+            "SELECT response_text FROM responses WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute(
+                "UPDATE responses SET last_access = ? WHERE cache_key = ?", (time.time(), key)
+            )
+        return row[0]
+
+    def put(self, text: str, model: str, response_text: str, temperature=None, max_tokens=None, sample_index: int = 0):
+        p_hash = prompt_hash(text)
+        key = make_key(p_hash, model, temperature, max_tokens, sample_index)
+        now = time.time()
+        exists = self.conn.execute(
+            "SELECT 1 FROM responses WHERE cache_key = ?", (key,)
+        ).fetchone() is not None
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, p_hash, model, temperature, max_tokens, sample_index, response_text, now, now),
+            )
+        if not exists:
+            self._count += 1
+        self._evict()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM responses WHERE cache_key IN "
+                "(SELECT cache_key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+        self._count -= excess
+        self.evictions += excess
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, int]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
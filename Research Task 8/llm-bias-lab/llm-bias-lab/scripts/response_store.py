@@ -0,0 +1,416 @@
+"""
+response_store.py
+Compact SQLite store for model responses, an alternative to responses.jsonl.
+
+JSONL repeats the full prompt (statistics block included) and the metadata
+dict in every record. Here prompt texts and metadata are stored once each,
+content-addressed by SHA-256 (prompts zlib-compressed), and responses are
+rows with typed columns indexed by hypothesis/condition/model. query() reads
+only the columns asked for and resolves prompts lazily, so analyses that
+never touch prompt_text never decompress it.
+
+Every record round-trips exactly: the key order of each record is kept as a
+shared "layout", and fields that are not standard columns (or whose values
+do not fit the column type) are kept as JSON in `extra`, so export_jsonl()
+reproduces the original lines.
+
+Paths ending in .sqlite/.sqlite3/.db are treated as stores by iter_responses(),
+which analyze_bias, latency_report, extract_claims and entity_claims use to
+read either format.
+
+Usage:
+  python scripts/response_store.py import results/responses.jsonl results/responses.sqlite
+  python scripts/response_store.py export results/responses.sqlite results/responses.jsonl
+  python scripts/response_store.py stats results/responses.sqlite
+  python scripts/response_store.py selftest
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import sqlite3
+import tempfile
+import zlib
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+from jsonl_io import JSONLWriter, iter_jsonl
+
+STORE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+# record key -> (column, accepted Python types); prompt_text and metadata are stored by hash
+COLUMNS = {
+    "timestamp": (str,),
+    "model": (str,),
+    "prompt_id": (str,),
+    "hypothesis": (str,),
+    "condition": (str,),
+    "sample_index": (int,),
+    "response_text": (str,),
+    "latency_s": (float,),
+    "ttft_s": (float,),
+    "input_tokens": (int,),
+    "output_tokens": (int,),
+    "retries": (int,),
+    "cached": (bool,),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash TEXT PRIMARY KEY,
+    text_z      BLOB NOT NULL,
+    raw_bytes   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    meta_hash TEXT PRIMARY KEY,
+    json      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS layouts (
+    layout_id INTEGER PRIMARY KEY,
+    keys      TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS responses (
+    id            INTEGER PRIMARY KEY,
+    layout_id     INTEGER NOT NULL,
+    timestamp     TEXT,
+    model         TEXT,
+    prompt_id     TEXT,
+    hypothesis    TEXT,
+    condition     TEXT,
+    sample_index  INTEGER,
+    prompt_hash   TEXT,
+    meta_hash     TEXT,
+    response_text TEXT,
+    latency_s     REAL,
+    ttft_s        REAL,
+    input_tokens  INTEGER,
+    output_tokens INTEGER,
+    retries       INTEGER,
+    cached        INTEGER,
+    extra         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_responses_hcm ON responses(hypothesis, condition, model);
+CREATE INDEX IF NOT EXISTS idx_responses_model ON responses(model);
+CREATE INDEX IF NOT EXISTS idx_responses_prompt ON responses(prompt_id);
+"""
+
+_ROW_COLUMNS = ["layout_id"] + list(COLUMNS) + ["prompt_hash", "meta_hash", "extra"]
+_INSERT = f"INSERT INTO responses ({', '.join(_ROW_COLUMNS)}) VALUES ({', '.join('?' * len(_ROW_COLUMNS))})"
+
+
+def is_store(path) -> bool:
+    return Path(path).suffix.lower() in STORE_SUFFIXES
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _fits(value, types) -> bool:
+    """Whether a value round-trips through its typed column unchanged."""
+    if value is None:
+        return True
+    t = type(value)
+    if t not in types:
+        return False
+    if t is float:
+        return math.isfinite(value)  # SQLite stores NaN as NULL
+    if t is int:
+        return -2**63 <= value < 2**63
+    return True
+
+
+class ResponseStore:
+    """
+    Append/query interface over the SQLite layout above. write()/flush()/close()
+    mirror JSONLWriter so run_experiment can log straight into a store.
+    """
+
+    def __init__(self, path, batch_size: int = 1000, prompt_cache: int = 256):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.written = 0
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._layouts = {tuple(json.loads(k)): i for i, k in self.conn.execute("SELECT layout_id, keys FROM layouts")}
+        self._layout_keys = {i: k for k, i in self._layouts.items()}
+        self._known_prompts = set()
+        self._known_meta = set()
+        self._pending = []
+        self._prompt_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._prompt_cache_max = prompt_cache
+
+    # -- writing --
+
+    def _layout_id(self, keys: tuple) -> int:
+        lid = self._layouts.get(keys)
+        if lid is None:
+            cur = self.conn.execute("INSERT INTO layouts (keys) VALUES (?)", (json.dumps(list(keys)),))
+            lid = cur.lastrowid
+            self._layouts[keys] = lid
+            self._layout_keys[lid] = keys
+        return lid
+
+    def _prompt_ref(self, text: str) -> str:
+        h = _sha(text)
+        if h not in self._known_prompts:
+            raw = text.encode("utf-8")
+            self.conn.execute("INSERT OR IGNORE INTO prompts VALUES (?, ?, ?)", (h, zlib.compress(raw, 6), len(raw)))
+            self._known_prompts.add(h)
+        return h
+
+    def _meta_ref(self, meta) -> str:
+        text = json.dumps(meta, ensure_ascii=False)
+        h = _sha(text)
+        if h not in self._known_meta:
+            self.conn.execute("INSERT OR IGNORE INTO metadata VALUES (?, ?)", (h, text))
+            self._known_meta.add(h)
+        return h
+
+    def _row(self, record: dict) -> tuple:
+        extra = {}
+        values = dict.fromkeys(COLUMNS)
+        for k, v in record.items():
+            types = COLUMNS.get(k)
+            if types is not None and _fits(v, types):
+                values[k] = v
+            elif k not in ("prompt_text", "metadata"):
+                extra[k] = v
+        prompt = record.get("prompt_text")
+        p_ref = self._prompt_ref(prompt) if isinstance(prompt, str) else None
+        if "prompt_text" in record and p_ref is None:
+            extra["prompt_text"] = prompt
+        m_ref = self._meta_ref(record["metadata"]) if "metadata" in record else None
+        return (self._layout_id(tuple(record)), *values.values(), p_ref, m_ref,
+                json.dumps(extra, ensure_ascii=False) if extra else None)
+
+    def write(self, record: dict):
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[dict]) -> int:
+        n = 0
+        it = iter(records)
+        while True:
+            batch = list(islice(it, self.batch_size))
+            if not batch:
+                return n
+            self._pending.extend(batch)
+            self.flush()
+            n += len(batch)
+
+    def flush(self):
+        """Commit every record written so far."""
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(_INSERT, [self._row(r) for r in self._pending])
+        self.written += len(self._pending)
+        self._pending = []
+
+    def import_jsonl(self, path) -> int:
+        return self.write_many(iter_jsonl(path))
+
+    # -- reading --
+
+    def prompt_text(self, prompt_hash: str) -> Optional[str]:
+        text = self._prompt_cache.get(prompt_hash)
+        if text is not None:
+            self._prompt_cache.move_to_end(prompt_hash)
+            return text
+        row = self.conn.execute("SELECT text_z FROM prompts WHERE prompt_hash = ?", (prompt_hash,)).fetchone()
+        if row is None:
+            return None
+        text = zlib.decompress(row[0]).decode("utf-8")
+        self._prompt_cache[prompt_hash] = text
+        if len(self._prompt_cache) > self._prompt_cache_max:
+            self._prompt_cache.popitem(last=False)
+        return text
+
+    def query(self, columns: Optional[Sequence[str]] = None, batch_size: int = 1000,
+              **filters) -> Iterator[dict]:
+        """
+        Yield records in insertion order with only `columns` (all fields if
+        None). Keyword filters (hypothesis=, condition=, model=, prompt_id=, ...)
+        take a value or a list of values and run against the indexed columns.
+        """
+        self.flush()
+        wanted = None if columns is None else set(columns)
+        select = ["layout_id"]
+        for k in COLUMNS:
+            if wanted is None or k in wanted:
+                select.append(k)
+        need_prompt = wanted is None or "prompt_text" in wanted
+        need_meta = wanted is None or "metadata" in wanted
+        # always read extra: any field, standard or not, may have spilled into it
+        select += ["prompt_hash"] * need_prompt + ["meta_hash"] * need_meta + ["extra"]
+
+        where, params = [], []
+        for k, v in filters.items():
+            if k not in COLUMNS:
+                raise ValueError(f"Cannot filter on {k!r}; indexed columns are {list(COLUMNS)}")
+            vals = list(v) if isinstance(v, (list, tuple, set)) else [v]
+            where.append(f"{k} IN ({', '.join('?' * len(vals))})")
+            params.extend(vals)
+        sql = f"SELECT {', '.join(select)} FROM responses"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+
+        meta_cache = {}
+        cur = self.conn.cursor()
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                values = dict(zip(select, row))
+                extra = json.loads(values["extra"]) if values["extra"] else {}
+                out = {}
+                for k in self._layout_keys[values["layout_id"]]:
+                    if wanted is not None and k not in wanted:
+                        continue
+                    if k in extra:
+                        out[k] = extra[k]
+                    elif k == "prompt_text":
+                        out[k] = self.prompt_text(values["prompt_hash"])
+                    elif k == "metadata":
+                        h = values["meta_hash"]
+                        if h not in meta_cache:
+                            meta_cache[h] = self.conn.execute(
+                                "SELECT json FROM metadata WHERE meta_hash = ?", (h,)).fetchone()[0]
+                        out[k] = json.loads(meta_cache[h])
+                    elif k == "cached" and values[k] is not None:
+                        out[k] = bool(values[k])
+                    else:
+                        out[k] = values[k]
+                yield out
+
+    def export_jsonl(self, out_path, **filters) -> int:
+        with JSONLWriter(out_path) as writer:
+            for record in self.query(**filters):
+                writer.write(record)
+        return writer.written
+
+    def __len__(self) -> int:
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> dict:
+        self.flush()
+        prompts, stored, raw = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(text_z)), 0), COALESCE(SUM(raw_bytes), 0) FROM prompts").fetchone()
+        referenced = self.conn.execute(
+            "SELECT COALESCE(SUM(p.raw_bytes), 0) FROM responses r JOIN prompts p USING (prompt_hash)").fetchone()[0]
+        return {
+            "responses": len(self),
+            "unique_prompts": prompts,
+            "unique_metadata": self.conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0],
+            "prompt_bytes_as_jsonl": referenced,
+            "prompt_bytes_stored": stored,
+            "prompt_bytes_unique_raw": raw,
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_responses(path, columns: Optional[Sequence[str]] = None, **filters) -> Iterator[dict]:
+    """Records from a response store or a JSONL file (filters/columns applied either way)."""
+    if is_store(path):
+        store = ResponseStore(path)
+        try:
+            yield from store.query(columns, **filters)
+        finally:
+            store.close()
+        return
+    sets = {k: set(v) if isinstance(v, (list, tuple, set)) else {v} for k, v in filters.items()}
+    for r in iter_jsonl(path):
+        if all(r.get(k) in vals for k, vals in sets.items()):
+            yield r if columns is None else {k: r[k] for k in columns if k in r}
+
+
+def selftest() -> list:
+    """
+    Write records whose values do not fit their columns (and so spill into
+    `extra`) and check that full and per-column queries return them as written.
+    Returns a list of mismatch messages.
+    """
+    records = [
+        {"timestamp": "t0", "model": "m", "prompt_id": "p0", "hypothesis": "H1", "condition": "a",
+         "sample_index": 0, "prompt_text": "q", "response_text": "r", "latency_s": 1.5, "ttft_s": None,
+         "input_tokens": 3, "output_tokens": 0, "retries": 0, "cached": False, "metadata": {"k": 1}},
+        {"prompt_id": "p1", "sample_index": "0", "latency_s": 1, "ttft_s": True, "input_tokens": 2.0,
+         "retries": 2**70, "cached": 1, "prompt_text": ["not", "text"], "response_text": None, "note": "x"},
+        {"response_text": "only", "model": 7, "hypothesis": {"nested": True}},
+    ]
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        with ResponseStore(Path(tmp) / "selftest.sqlite", batch_size=2) as store:
+            store.write_many(records)
+            if list(store.query()) != records:
+                failures.append("full query differs from the records written")
+            keys = sorted({k for r in records for k in r})
+            for k in keys:
+                got = list(store.query([k, "response_text"]))
+                want = [{c: r[c] for c in r if c in (k, "response_text")} for r in records]
+                if got != want:
+                    failures.append(f"query([{k!r}, 'response_text']) returned {got}, expected {want}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert between responses.jsonl and the SQLite response store.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="Append a JSONL file to a store")
+    imp.add_argument("jsonl")
+    imp.add_argument("store")
+    exp = sub.add_parser("export", help="Write a store (optionally filtered) back to JSONL")
+    exp.add_argument("store")
+    exp.add_argument("jsonl")
+    exp.add_argument("--hypothesis", action="append")
+    exp.add_argument("--condition", action="append")
+    exp.add_argument("--model", action="append")
+    st = sub.add_parser("stats", help="Row counts and prompt deduplication")
+    st.add_argument("store")
+    sub.add_parser("selftest", help="Round-trip awkward records through a temporary store")
+    args = ap.parse_args()
+
+    if args.cmd == "import":
+        with ResponseStore(args.store) as store:
+            n = store.import_jsonl(args.jsonl)
+        print(f"Imported {n} records into {args.store}")
+    elif args.cmd == "export":
+        filters = {k: getattr(args, k) for k in ("hypothesis", "condition", "model") if getattr(args, k)}
+        with ResponseStore(args.store) as store:
+            n = store.export_jsonl(args.jsonl, **filters)
+        print(f"Exported {n} records to {args.jsonl}")
+    elif args.cmd == "selftest":
+        failures = selftest()
+        for f in failures:
+            print(f)
+        if failures:
+            raise SystemExit(f"{len(failures)} round-trip mismatch(es)")
+        print("Store round-trips full and projected queries")
+    else:
+        with ResponseStore(args.store) as store:
+            print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
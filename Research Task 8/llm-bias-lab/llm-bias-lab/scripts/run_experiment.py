@@ -7,89 +7,298 @@ Usage:
     --prompts prompts/prompt_bank.jsonl \
     --out results/responses.jsonl \
     --model "chatgpt-gpt4" \
-    --manual
+    --api-base http://127.0.0.1:8800
 
 Modes:
-  --manual   : prompts will be displayed one by one; user pastes model responses.
-  --api-key  : optional flag to load API calls (future integration).
+  --manual   : phase one of hand collection: write every job not yet logged in --out to the
+               --work file(s) (see manual_batch.py; --split N to share the work) and exit.
+  --import-responses FILE... : phase two: read filled-in work files, check them against the
+               bank, drop blanks/duplicates/already-logged jobs and append the rest in one pass.
+  --api-base : call an OpenAI/Anthropic/Google-style endpoint (llm_client.py), e.g. the real
+               provider or a local mock_provider.py; the provider is taken from config-expanded
+               records or --provider. --concurrency N keeps N calls in flight; responses are
+               still logged in bank order, and 429/5xx are retried with backoff (--max-retries).
+  --cache    : reuse responses from a persistent SQLite cache (see response_cache.py).
+  --replay   : serve every response from --cache only; misses are skipped, no calls made.
+
+Each record carries per-call accounting: latency_s and ttft_s (time to first
+token; none for imported manual responses), input_tokens/output_tokens
+(counted with --tokenizer unless the provider reports usage), retries and
+cached. Cache hits have no latency. Summarize with latency_report.py.
 """
 
 import argparse
 import json
-import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import time
 
+import instrument
+from jsonl_io import JSONLWriter
+from llm_client import PROVIDERS, LLMClient, LLMError
+from manual_batch import collect, job_key, read_work, write_work
+from prompt_bank import iter_prompt_bank
+from prompt_budget import get_tokenizer
+from response_cache import ResponseCache
+from response_store import ResponseStore, is_store, iter_responses
+
 BASE = Path(__file__).resolve().parents[1]
 RESULTS_DIR = BASE / "results"
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
 def load_prompts(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                yield json.loads(line)
-
-def write_record(path: Path, record: dict):
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-def manual_mode(prompt: dict, model: str):
-    print("=" * 80)
-    print(f"[{prompt['hypothesis']} | {prompt['condition']}]")
-    print(prompt["model_input"])
-    print("-" * 80)
-    print("Paste or type the model's response below. Finish input with a blank line.")
-    lines = []
-    while True:
-        line = input()
-        if line.strip() == "":
-            break
-        lines.append(line)
-    return "\n".join(lines)
+    """Prompt records; shared dataset blocks are stitched back in when model_input is first read."""
+    return iter_prompt_bank(path)
+
+def prompt_jobs(prompt: dict, args):
+    """
+    (model, temperature, max_tokens, sample_index) to run for one prompt.
+    Config-expanded banks pin these per record; plain banks use the CLI flags.
+    """
+    if "sample_index" in prompt:
+        yield (prompt.get("model") or args.model, prompt.get("temperature", args.temperature),
+               prompt.get("max_tokens", args.max_tokens), prompt["sample_index"])
+        return
+    for sample_index in range(args.samples):
+        yield args.model, args.temperature, args.max_tokens, sample_index
+
+class CallTimer:
+    """Wall-clock latency and time to first token for one model call."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first = None
+        self.end = None
+        self.retries = 0
+
+    def first_token(self):
+        if self.first is None:
+            self.first = time.perf_counter()
+
+    def stop(self):
+        self.end = time.perf_counter()
+        self.first_token()
+
+    @property
+    def latency_s(self):
+        return round(self.end - self.start, 4)
+
+    @property
+    def ttft_s(self):
+        return round(self.first - self.start, 4)
+
+def make_record(prompt: dict, model: str, sample_index: int, response_text: str, timer, usage: dict,
+                cached: bool, count_tokens) -> dict:
+    # a provider-reported count wins, even 0; only a missing one is estimated locally
+    input_tokens, output_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+    return {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "model": model,
+        "prompt_id": prompt["prompt_id"],
+        "hypothesis": prompt["hypothesis"],
+        "condition": prompt["condition"],
+        "sample_index": sample_index,
+        "prompt_text": prompt["model_input"],
+        "response_text": response_text,
+        "metadata": prompt.get("metadata", {}),
+        "latency_s": timer.latency_s if timer else None,
+        "ttft_s": timer.ttft_s if timer else None,
+        "input_tokens": count_tokens(prompt["model_input"]) if input_tokens is None else input_tokens,
+        "output_tokens": count_tokens(response_text) if output_tokens is None else output_tokens,
+        "retries": timer.retries if timer else 0,
+        "cached": cached,
+    }
+
+def logged_jobs(out_path: Path) -> set:
+    """(prompt_id, model, sample_index) of every response already in --out."""
+    if not out_path.exists():
+        return set()
+    return {job_key(r["prompt_id"], r["model"], r["sample_index"])
+            for r in iter_responses(out_path, ["prompt_id", "model", "sample_index"])}
+
+def export_manual(args):
+    """Phase one of hand collection: pending jobs to work files."""
+    done_jobs = logged_jobs(Path(args.out))
+    jobs = [(prompt, model, sample_index)
+            for prompt in load_prompts(args.prompts)
+            for model, _, _, sample_index in prompt_jobs(prompt, args)
+            if job_key(prompt["prompt_id"], model, sample_index) not in done_jobs]
+    if not jobs:
+        print(f"Nothing pending: every job in {args.prompts} is logged in {args.out}")
+        return
+    try:
+        paths = write_work(jobs, args.work, split=args.split, overwrite=args.force)
+    except FileExistsError as e:
+        raise SystemExit(f"{e}\nImport them first (--import-responses), pick another --work path, "
+                         f"or pass --force to overwrite.")
+    print(f"Exported {len(jobs)} pending job(s) ({len(done_jobs)} already logged) to:")
+    for path in paths:
+        print(f"  {path}")
+    print(f"\nFill in the responses, then run with --import-responses {' '.join(str(p) for p in paths)}")
+
+def import_manual(args, writer, cache, count_tokens):
+    """Phase two: validated, deduplicated responses from work files, appended in bank order."""
+    expected = {}
+    for prompt in load_prompts(args.prompts):
+        for model, temperature, max_tokens, sample_index in prompt_jobs(prompt, args):
+            expected[job_key(prompt["prompt_id"], model, sample_index)] = (prompt, temperature, max_tokens)
+    logged = logged_jobs(Path(args.out))
+    accepted, skipped, problems = collect(read_work(args.import_responses), expected, logged)
+    for msg in problems:
+        print(f"  ! {msg}", file=sys.stderr)
+
+    with instrument.span("import_responses", items=len(accepted)):
+        for key, (prompt, temperature, max_tokens) in expected.items():
+            if key not in accepted:
+                continue
+            _, model, sample_index = key
+            writer.write(make_record(prompt, model, sample_index, accepted[key], None, {}, False, count_tokens))
+            if cache is not None:
+                cache.put(prompt["model_input"], model, accepted[key], temperature, max_tokens, sample_index)
+    instrument.count("responses", len(accepted))
+    pending = sum(1 for key in expected if key not in accepted and key not in logged)
+    print(f"Imported {len(accepted)} response(s) into {args.out}; skipped: {dict(skipped) or 'none'}; "
+          f"still pending: {pending}")
+
+def call_model(client: LLMClient, provider: str, prompt_text: str, model: str, temperature, max_tokens,
+               sample_index):
+    """(response_text, timer, usage) for one API call; runs on a worker thread."""
+    timer = CallTimer()
+    with instrument.span("llm_call"):
+        text, usage = client.complete(provider, model, prompt_text, temperature, max_tokens,
+                                      seed=sample_index, timer=timer)
+    timer.stop()
+    return text, timer, usage
+
+def done(value) -> Future:
+    f = Future()
+    f.set_result(value)
+    return f
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--prompts", default="prompts/prompt_bank.jsonl")
     ap.add_argument("--out", default="results/responses.jsonl")
     ap.add_argument("--model", default="chatgpt-gpt4")
-    ap.add_argument("--manual", action="store_true")
+    ap.add_argument("--manual", action="store_true", help="export pending jobs to --work for hand collection and exit")
+    ap.add_argument("--work", default="results/manual_work.md", help="manual work file: a directory (one .md per job), .md, .csv or .xlsx")
+    ap.add_argument("--split", type=int, default=1, help="split the manual work into N files")
+    ap.add_argument("--force", action="store_true", help="let --manual overwrite existing work files")
+    ap.add_argument("--import-responses", nargs="+", default=None, metavar="FILE", help="append filled-in manual work files to --out")
+    ap.add_argument("--temperature", type=float, default=None)
+    ap.add_argument("--max-tokens", type=int, default=None)
+    ap.add_argument("--samples", type=int, default=1, help="responses to collect per prompt (ignored for config-expanded banks)")
+    ap.add_argument("--cache", default=None, help="SQLite response cache path (disabled if omitted)")
+    ap.add_argument("--cache-max-entries", type=int, default=100_000)
+    ap.add_argument("--replay", action="store_true", help="serve responses from --cache only")
+    ap.add_argument("--api-base", default=None, help="Base URL of an OpenAI/Anthropic/Google-style API (or mock_provider.py)")
+    ap.add_argument("--provider", default="openai", choices=PROVIDERS, help="API flavour for records that do not name one")
+    ap.add_argument("--concurrency", type=int, default=4, help="API calls kept in flight")
+    ap.add_argument("--max-retries", type=int, default=5, help="Retries per call on 429/5xx/connection errors")
+    ap.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    ap.add_argument("--no-stream", action="store_true", help="Request whole responses (ttft_s then equals latency_s)")
+    ap.add_argument("--tokenizer", default="regex", help="token counter for input/output_tokens: regex | chars | tiktoken[:<encoding>]")
+    instrument.add_arguments(ap)
     args = ap.parse_args()
+    instrument.setup(args)
+
+    if args.replay and not args.cache:
+        ap.error("--replay requires --cache")
+    if args.manual and args.import_responses:
+        ap.error("--manual exports work files and --import-responses reads them back; run them separately")
+    if (args.manual or args.import_responses) and (args.api_base or args.replay):
+        ap.error("--manual/--import-responses cannot be combined with --api-base or --replay")
+
+    if args.manual:
+        export_manual(args)
+        return
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
+    cache = ResponseCache(args.cache, max_entries=args.cache_max_entries) if args.cache else None
+    # an --out ending in .sqlite/.db logs into a deduplicated response store instead of JSONL
+    writer = ResponseStore(out_path) if is_store(out_path) else JSONLWriter(out_path)
+    count_tokens = get_tokenizer(args.tokenizer)
+
+    if args.import_responses:
+        try:
+            import_manual(args, writer, cache, count_tokens)
+        finally:
+            writer.close()
+            if cache is not None:
+                cache.close()
+        return
 
     print(f"Running experiment — model={args.model}")
     print(f"Prompts loaded from {args.prompts}")
     print(f"Logging responses to {out_path}\n")
 
-    for prompt in load_prompts(args.prompts):
-        timestamp = datetime.utcnow().isoformat(timespec="seconds")
-
-        if args.manual:
-            response_text = manual_mode(prompt, args.model)
-        else:
-            # Placeholder for API call integration if added later
-            response_text = "[API not enabled]"
-
-        record = {
-            "timestamp": timestamp,
-            "model": args.model,
-            "prompt_id": prompt["prompt_id"],
-            "hypothesis": prompt["hypothesis"],
-            "condition": prompt["condition"],
-            "prompt_text": prompt["model_input"],
-            "response_text": response_text,
-            "metadata": prompt.get("metadata", {}),
-        }
-
-        write_record(out_path, record)
-        print(f"Logged: {prompt['prompt_id']}")
-
-        # Throttle for manual pacing or rate limits
-        time.sleep(0.5)
+    client = None
+    pool = None
+    if args.api_base:
+        client = LLMClient(args.api_base, timeout=args.timeout, max_retries=args.max_retries,
+                           stream=not args.no_stream)
+        pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="llm")
+        print(f"Calling {args.api_base} with {max(1, args.concurrency)} request(s) in flight\n")
+
+    def jobs():
+        """(prompt, model, temperature, max_tokens, sample_index, cached_text, future) in bank order."""
+        for prompt in load_prompts(args.prompts):
+            for model, temperature, max_tokens, sample_index in prompt_jobs(prompt, args):
+                cache_args = (prompt["model_input"], model, temperature, max_tokens, sample_index)
+                response_text = cache.get(*cache_args) if cache is not None else None
+                cached = response_text is not None
+                instrument.count("cache_hits" if cached else "cache_misses")
+                if cached:
+                    yield prompt, model, temperature, max_tokens, sample_index, True, done((response_text, None, {}))
+                elif args.replay:
+                    print(f"Cache miss (skipped): {prompt['prompt_id']} sample={sample_index}")
+                elif client is not None:
+                    provider = prompt.get("provider") or args.provider
+                    yield prompt, model, temperature, max_tokens, sample_index, False, pool.submit(
+                        call_model, client, provider, prompt["model_input"], model, temperature, max_tokens,
+                        sample_index)
+                else:
+                    yield prompt, model, temperature, max_tokens, sample_index, False, done(("[API not enabled]", None, {}))
+
+    # Submitted calls wait in a bounded window and are logged in submission order, so
+    # the output matches a sequential run; the cache and writer stay on this thread.
+    window = max(1, args.concurrency) * 2 if client is not None else 1
+    pending = deque()
+    stream = jobs()
+    try:
+        while True:
+            for job in stream:
+                pending.append(job)
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+            prompt, model, temperature, max_tokens, sample_index, cached, future = pending.popleft()
+            try:
+                response_text, timer, usage = future.result()
+            except LLMError as e:
+                instrument.count("llm_errors")
+                print(f"Call failed (skipped): {prompt['prompt_id']} sample={sample_index}: {e}")
+                continue
+            if not cached and client is not None and cache is not None:
+                cache.put(prompt["model_input"], model, response_text, temperature, max_tokens, sample_index)
 
+            record = make_record(prompt, model, sample_index, response_text, timer, usage, cached, count_tokens)
+            writer.write(record)
+            instrument.count("responses")
+            print(f"Logged: {prompt['prompt_id']}" + (" (cached)" if cached else ""))
+    finally:
+        # on an error or Ctrl-C, drop queued calls but keep whatever was already logged
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close()
+        if cache is not None:
+            print(f"Cache stats: {json.dumps(cache.stats())}")
+            cache.close()
     print(f"\nAll responses logged at: {out_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+"""
+sentiment.py
+Pluggable, cached and parallel sentiment scoring for analyze_bias.
+
+Scorers:
+  textblob : TextBlob polarity in [-1, 1] (the original analyze_bias metric)
+  vader    : VADER compound score in [-1, 1]
+
+Scores are memoized on disk by (scorer, SHA-256 of the text), so re-analysis
+only pays for texts it has not seen. Misses are scored in batches across a
+process pool.
+"""
+
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import instrument
+
+SCORERS = ("textblob", "vader")
+
+_vader = None
+
+
+def textblob_polarity(text: str) -> float:
+    from textblob import TextBlob
+    try:
+        return TextBlob(text).sentiment.polarity
+    except Exception:
+        return 0.0
+
+
+def vader_compound(text: str) -> float:
+    global _vader
+    if _vader is None:
+        try:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        except ImportError as e:
+            raise ImportError("vader scorer requires vaderSentiment (pip install vaderSentiment)") from e
+        _vader = SentimentIntensityAnalyzer()
+    try:
+        return _vader.polarity_scores(text)["compound"]
+    except Exception:
+        return 0.0
+
+
+def get_scorer(name: str):
+    if name == "textblob":
+        return textblob_polarity
+    if name == "vader":
+        return vader_compound
+    raise ValueError(f"Unknown sentiment scorer: {name} (expected one of {SCORERS})")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _score_batch(scorer: str, texts: List[str]) -> List[float]:
+    fn = get_scorer(scorer)
+    return [fn(t) for t in texts]
+
+
+class ScoreCache:
+    """SQLite memo of sentiment scores keyed by (scorer, text hash)."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "scorer TEXT NOT NULL, text_hash TEXT NOT NULL, score REAL NOT NULL, "
+            "PRIMARY KEY (scorer, text_hash))"
+        )
+
+    def get_many(self, scorer: str, hashes: Sequence[str]) -> Dict[str, float]:
+        out = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT text_hash, score FROM scores WHERE scorer = ? AND text_hash IN ({marks})",
+                [scorer, *chunk],
+            )
+            out.update(rows)
+        return out
+
+    def put_many(self, scorer: str, items: Dict[str, float]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                [(scorer, h, s) for h, s in items.items()],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def score_texts(texts: Sequence[str], scorer: str = "textblob", workers: Optional[int] = None,
+                batch_size: int = 256, cache: Optional[ScoreCache] = None,
+                pool: Optional[Executor] = None) -> List[float]:
+    """
+    Score every text, in input order. Identical texts are scored once, cached
+    scores are reused, and the rest are split into batches for a process pool
+    (inline when there is less than two batches of work). Callers scoring many
+    chunks should pass one `pool` for the whole run instead of paying for a
+    new one per call.
+    """
+    get_scorer(scorer)  # fail fast on unknown names
+    with instrument.span("score_texts", items=len(texts)):
+        return _score_texts(texts, scorer, workers, batch_size, cache, pool)
+
+
+def _score_texts(texts, scorer, workers, batch_size, cache, pool=None) -> List[float]:
+    hashes = [text_hash(t) for t in texts]
+    unique = dict(zip(hashes, texts))
+    scores = cache.get_many(scorer, unique) if cache is not None else {}
+    todo = [(h, t) for h, t in unique.items() if h not in scores]
+    instrument.count("sentiment.cached", len(unique) - len(todo))
+    instrument.count("sentiment.scored", len(todo))
+
+    if todo:
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        workers = workers or os.cpu_count() or 1
+        if len(batches) > 1 and (pool is not None or workers > 1):
+            texts_by_batch = [[t for _, t in b] for b in batches]
+            if pool is not None:
+                results = pool.map(_score_batch, [scorer] * len(batches), texts_by_batch)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as own_pool:
+                    results = list(own_pool.map(_score_batch, [scorer] * len(batches), texts_by_batch))
+            fresh = {h: s for b, res in zip(batches, results) for (h, _), s in zip(b, res)}
+        else:
+            fn = get_scorer(scorer)
+            fresh = {h: fn(t) for h, t in todo}
+        scores.update(fresh)
+        if cache is not None:
+            cache.put_many(scorer, fresh)
+
+    return [scores[h] for h in hashes]
@@ -0,0 +1,162 @@
+"""
+significance.py
+Permutation tests, bootstrap confidence intervals and effect sizes for
+per-response metrics (e.g. sentiment) across prompt conditions.
+
+Every pair of conditions is compared within each hypothesis, both per model
+and pooled over models (model = "*"). Resampling is vectorized: a block of
+resamples is one index matrix, sized so a block stays under `max_cells`
+elements, so 10K resamples cost a handful of NumPy calls. Comparisons can be
+spread over a process pool; each gets its own seed from one SeedSequence, so
+results do not depend on the worker count.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import stats
+except ImportError:  # Welch p-values are skipped without scipy
+    stats = None
+
+MAX_CELLS = 4_000_000
+
+
+def _blocks(n_resamples: int, width: int, max_cells: int):
+    size = max(1, max_cells // max(width, 1))
+    for start in range(0, n_resamples, size):
+        yield min(size, n_resamples - start)
+
+
+def permutation_pvalue(x: np.ndarray, y: np.ndarray, n_resamples: int, rng: np.random.Generator,
+                       max_cells: int = MAX_CELLS) -> float:
+    """Two-sided permutation p-value for the difference in means."""
+    pooled = np.concatenate([x, y])
+    n, nx = len(pooled), len(x)
+    total = pooled.sum()
+    observed = abs(x.mean() - y.mean())
+    extreme = 0
+    for size in _blocks(n_resamples, n, max_cells):
+        # the nx smallest of n random keys are a uniform random relabelling of group x
+        idx = np.argpartition(rng.random((size, n)), nx - 1, axis=1)[:, :nx]
+        sx = pooled[idx].sum(axis=1)
+        diff = sx / nx - (total - sx) / (n - nx)
+        extreme += int(np.count_nonzero(np.abs(diff) >= observed - 1e-12))
+    return (extreme + 1) / (n_resamples + 1)
+
+
+def bootstrap_ci(x: np.ndarray, y: np.ndarray, n_resamples: int, rng: np.random.Generator,
+                 confidence: float = 0.95, max_cells: int = MAX_CELLS):
+    """Percentile bootstrap interval for mean(x) - mean(y)."""
+    diffs = []
+    for size in _blocks(n_resamples, len(x) + len(y), max_cells):
+        bx = x[rng.integers(0, len(x), (size, len(x)))].mean(axis=1)
+        by = y[rng.integers(0, len(y), (size, len(y)))].mean(axis=1)
+        diffs.append(bx - by)
+    diffs = np.concatenate(diffs)
+    alpha = (1 - confidence) / 2
+    lo, hi = np.quantile(diffs, [alpha, 1 - alpha])
+    return float(lo), float(hi)
+
+
+def cohens_d(x: np.ndarray, y: np.ndarray) -> float:
+    nx, ny = len(x), len(y)
+    if nx + ny <= 2:
+        return float("nan")
+    pooled = ((nx - 1) * x.var(ddof=1 if nx > 1 else 0) + (ny - 1) * y.var(ddof=1 if ny > 1 else 0)) / (nx + ny - 2)
+    if pooled == 0:
+        return 0.0 if x.mean() == y.mean() else float("nan")
+    return float((x.mean() - y.mean()) / np.sqrt(pooled))
+
+
+def hedges_g(x: np.ndarray, y: np.ndarray) -> float:
+    df = len(x) + len(y) - 2
+    return cohens_d(x, y) * (1 - 3 / (4 * df - 1)) if df > 0 else float("nan")
+
+
+def cliffs_delta(x: np.ndarray, y: np.ndarray) -> float:
+    """P(x > y) - P(x < y), via binary search over sorted y."""
+    ys = np.sort(y)
+    less = np.searchsorted(ys, x, side="left").sum()
+    greater = (len(ys) - np.searchsorted(ys, x, side="right")).sum()
+    return float((less - greater) / (len(x) * len(y)))
+
+
+def holm(pvalues: Sequence[float]) -> np.ndarray:
+    """Holm-Bonferroni adjusted p-values (NaNs are left out and kept as NaN)."""
+    p = np.asarray(pvalues, dtype=float)
+    out = np.full_like(p, np.nan)
+    ok = np.flatnonzero(~np.isnan(p))
+    order = ok[np.argsort(p[ok])]
+    m = len(order)
+    adjusted = np.maximum.accumulate((m - np.arange(m)) * p[order])
+    out[order] = np.minimum(adjusted, 1.0)
+    return out
+
+
+def compare(x: np.ndarray, y: np.ndarray, n_resamples: int = 10_000, seed=None,
+            confidence: float = 0.95) -> dict:
+    """Permutation p-value, bootstrap CI and effect sizes for mean(x) - mean(y)."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    row = {"n_a": len(x), "n_b": len(y), "mean_a": x.mean() if len(x) else np.nan,
+           "mean_b": y.mean() if len(y) else np.nan}
+    row["diff"] = row["mean_a"] - row["mean_b"]
+    if len(x) < 2 or len(y) < 2:
+        return {**row, "ci_low": np.nan, "ci_high": np.nan, "p_perm": np.nan, "p_welch": np.nan,
+                "cohens_d": np.nan, "hedges_g": np.nan, "cliffs_delta": np.nan}
+    rng = np.random.default_rng(seed)
+    row["ci_low"], row["ci_high"] = bootstrap_ci(x, y, n_resamples, rng, confidence)
+    row["p_perm"] = permutation_pvalue(x, y, n_resamples, rng)
+    row["p_welch"] = float(stats.ttest_ind(x, y, equal_var=False).pvalue) if stats is not None else np.nan
+    row["cohens_d"] = cohens_d(x, y)
+    row["hedges_g"] = hedges_g(x, y)
+    row["cliffs_delta"] = cliffs_delta(x, y)
+    return row
+
+
+def _compare_job(args):
+    return compare(*args)
+
+
+def run_tests(df: pd.DataFrame, metrics: List[str], n_resamples: int = 10_000, workers: Optional[int] = None,
+              seed: int = 0, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    df has one row per response with hypothesis, condition, model and metric
+    columns. Returns one row per (metric, hypothesis, model, condition pair)
+    with Holm-adjusted p-values per metric.
+    """
+    df = df.assign(model=df["model"].fillna("unknown").astype(str))
+    specs, jobs = [], []
+    for metric in metrics:
+        for hyp, hdf in df.groupby("hypothesis", sort=False):
+            scopes = [(m, mdf) for m, mdf in hdf.groupby("model", sort=True)]
+            if len(scopes) > 1:
+                scopes.append(("*", hdf))
+            for model, sdf in scopes:
+                values = {c: g[metric].to_numpy(dtype=float) for c, g in sdf.groupby("condition", sort=False)}
+                for a, b in itertools.combinations(values, 2):
+                    specs.append({"metric": metric, "hypothesis": hyp, "model": model,
+                                  "condition_a": a, "condition_b": b})
+                    jobs.append((values[a], values[b]))
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+    args = [(x, y, n_resamples, s, confidence) for (x, y), s in zip(jobs, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_compare_job, args, chunksize=max(1, len(args) // (workers * 4))))
+    else:
+        results = [_compare_job(a) for a in args]
+
+    out = pd.DataFrame([{**spec, **res} for spec, res in zip(specs, results)])
+    if out.empty:
+        return out
+    out["p_holm"] = np.nan
+    for metric, idx in out.groupby("metric").groups.items():
+        out.loc[idx, "p_holm"] = holm(out.loc[idx, "p_perm"])
+    return out
@@ -0,0 +1,250 @@
+"""
+similarity.py
+All-vs-all lexical similarity of responses across hypotheses, conditions,
+models and samples.
+
+Each response is a set of tokens. Up to `exact_max` responses, Jaccard and
+set-cosine are computed exactly for every pair with one sparse
+matrix product. Beyond that, responses are reduced to MinHash signatures:
+  - group-to-group mean Jaccard is estimated from per-permutation value
+    counts (no pair enumeration),
+  - per-condition distributions use a random sample of pairs,
+  - LSH banding finds near-duplicate pairs without O(n^2) comparisons.
+"""
+
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+_PRIME = np.uint64(4294967291)  # largest prime < 2**32: (a * x + b) stays below 2**64
+_EMPTY = np.iinfo(np.uint32).max
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a * x + b) mod p over CRC32 token ids."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._ids: Dict[str, int] = {}
+
+    def token_ids(self, tokens: Iterable[str]) -> np.ndarray:
+        ids = self._ids
+        out = []
+        for t in tokens:
+            v = ids.get(t)
+            if v is None:
+                v = ids[t] = zlib.crc32(t.encode("utf-8"))
+            out.append(v)
+        return np.array(out, dtype=np.uint64)
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        x = self.token_ids(tokens)
+        if x.size == 0:
+            return np.full(self.num_perm, _EMPTY, dtype=np.uint32)
+        return ((x[:, None] * self.a + self.b) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def lsh_candidates(sigs: np.ndarray, bands: int) -> set:
+    """Pairs (i, j), i < j, that share at least one band bucket."""
+    n, k = sigs.shape
+    rows = k // bands
+    pairs = set()
+    for b in range(bands):
+        buckets = defaultdict(list)
+        block = np.ascontiguousarray(sigs[:, b * rows:(b + 1) * rows])
+        for i, key in enumerate(map(bytes, block)):
+            buckets[key].append(i)
+        for members in buckets.values():
+            if 1 < len(members) <= 1000:  # skip degenerate buckets (e.g. empty responses)
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        pairs.add((members[x], members[y]))
+    return pairs
+
+
+def _group_codes(meta: pd.DataFrame, keys: List[str]) -> Tuple[np.ndarray, pd.DataFrame]:
+    codes = meta.groupby(keys, sort=True, dropna=False).ngroup().to_numpy()
+    labels = meta[keys].assign(_code=codes).drop_duplicates("_code").sort_values("_code")
+    return codes, labels.drop(columns="_code").reset_index(drop=True)
+
+
+def _exact_pairwise(token_sets: List[set]) -> Tuple[np.ndarray, np.ndarray]:
+    vocab: Dict[str, int] = {}
+    indptr, indices = [0], []
+    for toks in token_sets:
+        indices.extend(vocab.setdefault(t, len(vocab)) for t in toks)
+        indptr.append(len(indices))
+    X = sparse.csr_matrix(
+        (np.ones(len(indices)), indices, indptr), shape=(len(token_sets), max(len(vocab), 1))
+    )
+    inter = (X @ X.T).toarray()
+    size = np.asarray(X.sum(axis=1)).ravel()
+    union = size[:, None] + size[None, :] - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jac = np.where(union > 0, inter / union, 1.0)
+        cos = np.where(size[:, None] * size[None, :] > 0, inter / np.sqrt(size[:, None] * size[None, :]), 1.0)
+    return jac, cos
+
+
+def _matrix_from_pairs(sim: np.ndarray, codes: np.ndarray, m: int) -> np.ndarray:
+    G = sparse.csr_matrix((np.ones(len(codes)), (np.arange(len(codes)), codes)), shape=(len(codes), m))
+    total = np.asarray(G.T @ sim @ G)
+    counts = np.bincount(codes, minlength=m).astype(float)
+    pairs = np.outer(counts, counts)
+    total[np.diag_indices(m)] -= np.bincount(codes, weights=np.diag(sim), minlength=m)  # drop self-pairs
+    pairs[np.diag_indices(m)] -= counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(pairs > 0, total / pairs, np.nan)
+
+
+def _matrix_from_signatures(sigs: np.ndarray, codes: np.ndarray, m: int) -> np.ndarray:
+    """Mean estimated Jaccard between groups: sum over permutations of matching-value counts."""
+    n, k = sigs.shape
+    matches = np.zeros((m, m))
+    for p in range(k):
+        vals, inv = np.unique(sigs[:, p], return_inverse=True)
+        C = sparse.csr_matrix((np.ones(n), (codes, inv.ravel())), shape=(m, len(vals)))
+        matches += (C @ C.T).toarray()
+    counts = np.bincount(codes, minlength=m).astype(float)
+    pairs = np.outer(counts, counts)
+    matches[np.diag_indices(m)] -= counts * k  # every response matches itself
+    pairs[np.diag_indices(m)] -= counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(pairs > 0, matches / (k * pairs), np.nan)
+
+
+def _describe(values: np.ndarray) -> dict:
+    if values.size == 0:
+        return {"pairs": 0, "mean": np.nan, "std": np.nan, "p10": np.nan, "p50": np.nan, "p90": np.nan}
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    return {"pairs": int(values.size), "mean": values.mean(), "std": values.std(), "p10": p10, "p50": p50, "p90": p90}
+
+
+def _cell_pairs(a: np.ndarray, b: Optional[np.ndarray], limit: Optional[int], rng) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Index pairs of one matrix cell: i < j within `a` (b is None) or a x b.
+    With `limit`, at most that many pairs are drawn uniformly without
+    replacement by their flat position, so the full pair list is never built.
+    """
+    na = len(a)
+    total = na * (na - 1) // 2 if b is None else na * len(b)
+    if limit is None or total <= limit:
+        if b is None:
+            iu = np.triu_indices(na, k=1)
+            return a[iu[0]], a[iu[1]]
+        return np.repeat(a, len(b)), np.tile(b, na)
+    k = rng.choice(total, limit, replace=False)
+    if b is not None:
+        return a[k // len(b)], b[k % len(b)]
+    # row of flat index k in the row-major upper triangle, then its column
+    i = na - 2 - np.floor(np.sqrt(4.0 * na * (na - 1) - 8.0 * k - 7) / 2 - 0.5).astype(np.int64)
+    row_start = i * (2 * na - i - 1) // 2
+    i = np.where(row_start > k, i - 1, i)  # guard against sqrt rounding
+    row_start = i * (2 * na - i - 1) // 2
+    j = k - row_start + i + 1
+    return a[i], a[j]
+
+
+class SimilarityCollector:
+    """Accumulates tokens/signatures of streamed responses, then builds the similarity tables."""
+
+    GROUP_KEYS = ["hypothesis", "condition", "model"]
+
+    def __init__(self, exact_max: int = 1500, num_perm: int = 64, bands: int = 16,
+                 threshold: float = 0.8, pairs_per_cell: int = 5000, seed: int = 0):
+        self.exact_max = exact_max
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed + 1)
+        self.bands = bands
+        self.threshold = threshold
+        self.pairs_per_cell = pairs_per_cell
+        self.seed = seed
+        self.meta: List[tuple] = []
+        self.sigs: List[np.ndarray] = []
+        self.token_sets: Optional[List[set]] = []
+        self.sizes: List[int] = []
+
+    def add(self, record: dict, tokens: set):
+        self.meta.append((
+            record.get("hypothesis"), record.get("condition"), record.get("model"),
+            record.get("prompt_id"), record.get("sample_index"),
+        ))
+        self.sigs.append(self.hasher.signature(tokens))
+        self.sizes.append(len(tokens))
+        if self.token_sets is not None:
+            if len(self.token_sets) < self.exact_max:
+                self.token_sets.append(tokens)
+            else:
+                self.token_sets = None  # too many for exact pairs; signatures only from here on
+
+    def results(self):
+        """Return (matrix, distribution, near_duplicates) DataFrames."""
+        meta = pd.DataFrame(self.meta, columns=self.GROUP_KEYS + ["prompt_id", "sample_index"])
+        n = len(meta)
+        codes, labels = _group_codes(meta, self.GROUP_KEYS)
+        m = len(labels)
+        names = ["|".join(map(str, row)) for row in labels.itertuples(index=False)]
+        exact = self.token_sets is not None
+
+        if exact and n:
+            jac, cos = _exact_pairwise(self.token_sets)
+            matrix = _matrix_from_pairs(jac, codes, m)
+        else:
+            sigs = np.vstack(self.sigs) if n else np.zeros((0, self.hasher.num_perm), dtype=np.uint32)
+            matrix = _matrix_from_signatures(sigs, codes, m) if n else np.zeros((0, 0))
+        matrix_df = pd.DataFrame(matrix, index=names, columns=names)
+        matrix_df.index.name = "group"
+
+        # per-(hypothesis, group pair) distributions; comparisons stay within a hypothesis
+        rng = np.random.default_rng(self.seed)
+        sizes = np.asarray(self.sizes, dtype=float)
+        members = [np.flatnonzero(codes == g) for g in range(m)]
+        dist_rows = []
+        for g in range(m):
+            for h in range(g, m):
+                if labels.at[g, "hypothesis"] != labels.at[h, "hypothesis"]:
+                    continue
+                ii, jj = _cell_pairs(members[g], None if g == h else members[h],
+                                     None if exact else self.pairs_per_cell, rng)
+                if exact:
+                    j_vals, c_vals = jac[ii, jj], cos[ii, jj]
+                else:
+                    j_vals = (sigs[ii] == sigs[jj]).mean(axis=1)
+                    inter = j_vals * (sizes[ii] + sizes[jj]) / (1 + j_vals)
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        c_vals = np.where(sizes[ii] * sizes[jj] > 0, inter / np.sqrt(sizes[ii] * sizes[jj]), 1.0)
+                jd, cd = _describe(j_vals), _describe(c_vals)
+                dist_rows.append({
+                    "hypothesis": labels.at[g, "hypothesis"],
+                    "condition_a": labels.at[g, "condition"], "model_a": labels.at[g, "model"],
+                    "condition_b": labels.at[h, "condition"], "model_b": labels.at[h, "model"],
+                    "pairs": jd["pairs"], "sampled": not exact,
+                    **{f"jaccard_{k}": v for k, v in jd.items() if k != "pairs"},
+                    "cosine_mean": cd["mean"], "cosine_p50": cd["p50"],
+                })
+        dist_df = pd.DataFrame(dist_rows)
+
+        # near-duplicate pairs
+        if exact and n:
+            ii, jj = np.nonzero(np.triu(jac >= self.threshold, k=1))
+            sims = jac[ii, jj]
+        elif n:
+            cand = np.array(sorted(lsh_candidates(sigs, self.bands)), dtype=np.int64).reshape(-1, 2)
+            ii, jj = cand[:, 0], cand[:, 1]
+            sims = (sigs[ii] == sigs[jj]).mean(axis=1) if len(cand) else np.zeros(0)
+            keep = sims >= self.threshold
+            ii, jj, sims = ii[keep], jj[keep], sims[keep]
+        else:
+            ii = jj = sims = np.zeros(0, dtype=np.int64)
+        left = meta.iloc[ii].reset_index(drop=True).add_suffix("_a")
+        right = meta.iloc[jj].reset_index(drop=True).add_suffix("_b")
+        dup_df = pd.concat([left, right], axis=1)
+        dup_df["jaccard"] = sims
+        dup_df["estimated"] = not exact
+        return matrix_df, dist_df, dup_df
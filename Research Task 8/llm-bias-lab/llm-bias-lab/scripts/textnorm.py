@@ -0,0 +1,68 @@
+"""
+textnorm.py
+Shared text normalization for analyze_bias and validate_claims.
+
+  clean_text   : drop punctuation/symbols, lowercase, strip (analysis tokens)
+  norm_string  : casefold, strip, collapse whitespace (claim comparison)
+  tokenize     : clean_text(...).split(), memoized
+  clean_texts / norm_strings : batched versions over lists or pandas Series;
+                               each distinct value is normalized once
+
+ASCII text (the common case) goes through a byte-level translate table;
+other text is NFKC-normalized and filtered with a precompiled Unicode
+pattern that keeps letters and digits from every script. ascii_only=True
+reproduces the original `[^A-Za-z0-9\\s]` behavior, which drops them.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Iterable, List, Tuple
+
+try:
+    import pandas as pd
+except ImportError:  # batched helpers still accept plain iterables
+    pd = None
+
+_ASCII_ONLY_RE = re.compile(r"[^A-Za-z0-9\s]")
+_UNICODE_RE = re.compile(r"[^\w\s]|_")
+# ASCII bytes that _ASCII_ONLY_RE removes: everything but letters, digits and whitespace
+_ASCII_DELETE = bytes(c for c in range(128) if _ASCII_ONLY_RE.match(chr(c)))
+
+
+def clean_text(text: str, ascii_only: bool = False) -> str:
+    if text.isascii():
+        return text.encode("ascii").translate(None, _ASCII_DELETE).decode("ascii").lower().strip()
+    if ascii_only:
+        return _ASCII_ONLY_RE.sub("", text).lower().strip()
+    return _UNICODE_RE.sub("", unicodedata.normalize("NFKC", text)).lower().strip()
+
+
+def norm_string(x: str) -> str:
+    # str.split() and re's \s agree on what counts as whitespace
+    return " ".join(x.casefold().split())
+
+
+@lru_cache(maxsize=65536)
+def tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(clean_text(text).split())
+
+
+def _batched(fn: Callable[[str], str], values):
+    """Apply fn once per distinct value; Series in -> Series out, otherwise a list."""
+    if pd is not None and isinstance(values, pd.Series):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        done = [fn(v) for v in uniques]
+        return pd.Series([done[c] if c >= 0 else None for c in codes], index=values.index, dtype=object)
+    values = values if isinstance(values, list) else list(values)
+    done = {v: fn(v) for v in dict.fromkeys(values)}
+    return [done[v] for v in values]
+
+
+def clean_texts(texts: Iterable[str], ascii_only: bool = False):
+    fn = clean_text if not ascii_only else (lambda t: clean_text(t, ascii_only=True))
+    return _batched(fn, texts)
+
+
+def norm_strings(values: Iterable[str]) -> List[str]:
+    return _batched(norm_string, values)
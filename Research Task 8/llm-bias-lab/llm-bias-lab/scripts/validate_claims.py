@@ -33,48 +33,61 @@ python validate_claims.py --claims llm_claims.csv --truth ground_truth.csv --out
 
 import argparse
 import csv
+import itertools
 import json
-import math
 import os
 import re
-from collections import defaultdict, Counter
-from typing import Any, Dict, Iterable, List, Tuple, Union
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numeric batches fall back to plain Python
+    np = None
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+except ImportError:  # pure-Python bit-parallel fallback
+    _rf_levenshtein = None
+
+import instrument
+from textnorm import norm_string
 
 # ------------------------- IO helpers -------------------------
 
-def load_truth(path: str) -> Dict[str, Any]:
+def iter_truth(path: str) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, truth_value) pairs; CSV and JSONL are read line by line."""
     ext = os.path.splitext(path)[1].lower()
     if ext == ".csv":
-        return _load_truth_csv(path)
+        yield from _iter_truth_csv(path)
     elif ext in {".json"}:
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
         if isinstance(data, dict):
-            return data
+            yield from data.items()
         elif isinstance(data, list):
             # list of {"key": ..., "truth_value": ...}
-            out = {}
             for obj in data:
                 if isinstance(obj, dict) and "key" in obj:
-                    out[str(obj["key"])] = obj.get("truth_value")
-            return out
+                    yield str(obj["key"]), obj.get("truth_value")
         else:
             raise ValueError("Unsupported JSON truth format")
     elif ext in {".jsonl", ".ndjson"}:
-        out = {}
         with open(path, "r", encoding="utf-8") as f:
             for line in f:
                 if not line.strip():
                     continue
                 obj = json.loads(line)
                 if isinstance(obj, dict) and "key" in obj:
-                    out[str(obj["key"])] = obj.get("truth_value")
-        return out
+                    yield str(obj["key"]), obj.get("truth_value")
     else:
         raise ValueError(f"Unsupported truth file type: {ext}")
 
-def _load_truth_csv(path: str) -> Dict[str, Any]:
-    out = {}
+def load_truth(path: str) -> Dict[str, Any]:
+    return dict(iter_truth(path))
+
+def _iter_truth_csv(path: str) -> Iterator[Tuple[str, Any]]:
     with open(path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         # Accept various column names
@@ -93,33 +106,79 @@ def _load_truth_csv(path: str) -> Dict[str, Any]:
             else:
                 raise ValueError("Truth CSV must have at least two columns")
         for row in reader:
-            k = str(row[key_col])
-            v = row[val_col]
-            out[k] = v
-    return out
+            yield str(row[key_col]), row[val_col]
+
+class TruthStore:
+    """
+    Ground truth in an on-disk SQLite key-value index, for truth tables too
+    large to hold in memory. Values are stored JSON-encoded so JSON truth
+    keeps its types. The index is rebuilt only when the source file changes.
+    """
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS truth (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @classmethod
+    def build(cls, truth_path: str, db_path: str, batch_size: int = 50_000) -> "TruthStore":
+        store = cls(db_path)
+        st = os.stat(truth_path)
+        source = f"{os.path.abspath(truth_path)}:{st.st_size}:{st.st_mtime_ns}"
+        row = store.conn.execute("SELECT value FROM meta WHERE name = 'source'").fetchone()
+        if row and row[0] == source:
+            return store
+        with store.conn:
+            store.conn.execute("DELETE FROM truth")
+            items = iter_truth(truth_path)
+            while True:
+                batch = [(k, json.dumps(v)) for k, v in itertools.islice(items, batch_size)]
+                if not batch:
+                    break
+                store.conn.executemany("INSERT OR REPLACE INTO truth VALUES (?, ?)", batch)
+            store.conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source,))
+        return store
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        out = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for k, v in self.conn.execute(f"SELECT key, value FROM truth WHERE key IN ({marks})", chunk):
+                out[k] = json.loads(v)
+        return out
 
-def load_claims(path: str) -> List[Tuple[str, str, Any]]:
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM truth").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+def iter_claims(path: str) -> Iterator[Tuple[str, str, Any]]:
+    """Yield (example_id, key, claimed_value); CSV and JSONL are read line by line."""
     ext = os.path.splitext(path)[1].lower()
     if ext == ".csv":
-        return _load_claims_csv(path)
+        yield from _iter_claims_csv(path)
     elif ext in {".json"}:
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
-        return _claims_from_json_like(data)
+        yield from _claims_from_json_like(data)
     elif ext in {".jsonl", ".ndjson"}:
-        claims = []
         with open(path, "r", encoding="utf-8") as f:
             for line in f:
                 if not line.strip():
                     continue
                 obj = json.loads(line)
-                claims.extend(_claims_from_json_like(obj))
-        return claims
+                yield from _claims_from_json_like(obj)
     else:
         raise ValueError(f"Unsupported claims file type: {ext}")
 
-def _load_claims_csv(path: str) -> List[Tuple[str, str, Any]]:
-    claims: List[Tuple[str,str,Any]] = []
+def load_claims(path: str) -> List[Tuple[str, str, Any]]:
+    return list(iter_claims(path))
+
+def _iter_claims_csv(path: str) -> Iterator[Tuple[str, str, Any]]:
     with open(path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         headers = [h.strip() for h in reader.fieldnames or []]
@@ -139,8 +198,7 @@ def _load_claims_csv(path: str) -> List[Tuple[str, str, Any]]:
         if ex_col is None:
             ex_col = key_col  # group by key if no example id
         for row in reader:
-            claims.append((str(row[ex_col]), str(row[key_col]), row[val_col]))
-    return claims
+            yield (str(row[ex_col]), str(row[key_col]), row[val_col])
 
 def _claims_from_json_like(data: Any) -> List[Tuple[str,str,Any]]:
     out: List[Tuple[str,str,Any]] = []
@@ -169,11 +227,6 @@ def _claims_from_json_like(data: Any) -> List[Tuple[str,str,Any]]:
 
 # ------------------------- Normalization -------------------------
 
-_WS_RE = re.compile(r"\s+")
-
-def norm_string(x: str) -> str:
-    return _WS_RE.sub(" ", x.strip().casefold())
-
 _BOOL_MAP = {
     "true": True, "false": False,
     "yes": True, "no": False,
@@ -209,32 +262,73 @@ def to_number_maybe(x: Any) -> Union[float, None]:
             return None
     return None
 
+_LIST_SEP_RE = re.compile(r"[;,]")
+
 def split_list_maybe(x: Any) -> Union[List[str], None]:
     if x is None:
         return None
     s = str(x)
     if "," in s or ";" in s:
-        parts = re.split(r"[;,]", s)
+        parts = _LIST_SEP_RE.split(s)
         return [norm_string(p) for p in parts if p.strip()]
     return None
 
-def levenshtein(a: str, b: str) -> int:
-    # classic DP, iterative
-    a, b = a, b
+def _myers_distance(a: str, b: str, max_distance: Union[int, None] = None) -> int:
+    # bit-parallel edit distance (Myers 1999 / Hyyro 2001): one pass over `a`,
+    # the DP column for `b` packed into Python ints
+    m = len(b)
+    if m == 0:
+        return len(a)
+    peq: Dict[str, int] = {}
+    for i, c in enumerate(b):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    remaining = len(a)
+    for ca in a:
+        eq = peq.get(ca, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        remaining -= 1
+        # the last row drops by at most one per remaining character
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+    return score
+
+def levenshtein(a: str, b: str, max_distance: Union[int, None] = None) -> int:
+    """
+    Edit distance between a and b. With max_distance, stops early and returns
+    max_distance + 1 once the distance is known to exceed it; distances up
+    to the cutoff are exact.
+    """
+    if _rf_levenshtein is not None:
+        return _rf_levenshtein.distance(a, b, score_cutoff=max_distance)
+    if max_distance is not None and abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
     if len(a) < len(b):
         a, b = b, a
-    prev = list(range(len(b)+1))
-    for i, ca in enumerate(a, 1):
-        curr = [i]
-        for j, cb in enumerate(b, 1):
-            cost = 0 if ca == cb else 1
-            curr.append(min(prev[j]+1, curr[j-1]+1, prev[j-1]+cost))
-        prev = curr
-    return prev[-1]
+    return _myers_distance(a, b, max_distance)
+
+def _edit_diff(a: str, b: str, max_distance: Union[int, None]) -> str:
+    d = levenshtein(a, b, max_distance)
+    if max_distance is not None and d > max_distance:
+        return f"levenshtein>{max_distance}"
+    return f"levenshtein={d}"
 
 # ------------------------- Comparison -------------------------
 
-def compare_values(claim, truth, atol=0.0, rtol=0.0) -> Tuple[bool, str, str]:
+def compare_values(claim, truth, atol=0.0, rtol=0.0, max_edit_distance=None) -> Tuple[bool, str, str]:
     # Return (match, error_type, diff_info)
     # Try boolean
     bc = to_bool_maybe(claim)
@@ -271,28 +365,219 @@ def compare_values(claim, truth, atol=0.0, rtol=0.0) -> Tuple[bool, str, str]:
     if match:
         return (True, "ok", "")
     # provide edit distance as diff
-    d = levenshtein(sc, st)
-    return (False, "mismatch_string", f"levenshtein={d}")
+    return (False, "mismatch_string", _edit_diff(sc, st, max_edit_distance))
+
+# ------------------------- Batched comparison -------------------------
+
+class ValueIndex:
+    """
+    Memoized parses of values, so each distinct value is parsed once no
+    matter how many claims share it. bool/number are parsed up front (every
+    comparison needs them); list and normalized-string forms on demand.
+    The memo is dropped once it holds more than max_entries values, so
+    streaming validation stays bounded in memory.
+    """
+
+    def __init__(self, max_entries: int = 1_000_000):
+        self.max_entries = max_entries
+        self._typed: Dict[Any, Tuple[Any, Any]] = {}
+        self._typed_str: Dict[str, Tuple[Any, Any]] = {}
+        self._lists: Dict[Any, Any] = {}
+        self._strings: Dict[Any, str] = {}
+
+    def trim(self):
+        memos = (self._typed, self._typed_str, self._lists, self._strings)
+        if sum(len(m) for m in memos) > self.max_entries:
+            for m in memos:
+                m.clear()
+
+    @staticmethod
+    def _key(x):
+        try:
+            hash(x)
+        except TypeError:
+            return None
+        return (type(x), x)
+
+    def typed(self, x) -> Tuple[Any, Any]:
+        if type(x) is str:  # fast path for CSV values
+            r = self._typed_str.get(x)
+            if r is None:
+                r = self._typed_str[x] = (to_bool_maybe(x), to_number_maybe(x))
+            return r
+        k = self._key(x)
+        r = self._typed.get(k) if k is not None else None
+        if r is None:
+            r = (to_bool_maybe(x), to_number_maybe(x))
+            if k is not None:
+                self._typed[k] = r
+        return r
+
+    def counter(self, x):
+        k = self._key(x)
+        if k is not None and k in self._lists:
+            return self._lists[k]
+        lst = split_list_maybe(x)
+        r = Counter(lst) if lst is not None else None
+        if k is not None:
+            self._lists[k] = r
+        return r
+
+    def string(self, x) -> str:
+        k = self._key(x)
+        r = self._strings.get(k) if k is not None else None
+        if r is None:
+            r = norm_string(str(x))
+            if k is not None:
+                self._strings[k] = r
+        return r
+
+
+@instrument.traced("compare_values", items=lambda out, pairs, *a, **k: len(pairs))
+def compare_batch(pairs: List[Tuple[Any, Any]], atol=0.0, rtol=0.0,
+                  values: ValueIndex = None, max_edit_distance=None) -> List[Tuple[bool, str, str]]:
+    """
+    compare_values over many (claim, truth) pairs, same results in the same
+    order. Pairs are routed by detected type; numeric pairs are checked as
+    one NumPy array operation and strings compared by normalized form.
+    """
+    values = values or ValueIndex()
+    values.trim()
+    out: List[Any] = [None] * len(pairs)
+    num_idx, num_c, num_t = [], [], []
+    typed = values.typed
+    for i, (claim, truth) in enumerate(pairs):
+        bc, nc = typed(claim)
+        bt, nt = typed(truth)
+        if bc is not None or bt is not None:
+            if bc is None or bt is None:
+                out[i] = (False, "type_mismatch_bool", f"claim={claim} truth={truth}")
+            else:
+                out[i] = (bc == bt, "ok" if bc == bt else "mismatch_bool", "")
+        elif nc is not None or nt is not None:
+            if nc is None or nt is None:
+                out[i] = (False, "type_mismatch_number", f"claim={claim} truth={truth}")
+            else:
+                num_idx.append(i)
+                num_c.append(nc)
+                num_t.append(nt)
+        else:
+            lc, lt = values.counter(claim), values.counter(truth)
+            if lc is not None or lt is not None:
+                if lc is None or lt is None:
+                    out[i] = (False, "type_mismatch_list", f"claim={claim} truth={truth}")
+                else:
+                    out[i] = (lc == lt, "ok" if lc == lt else "mismatch_list", "")
+            else:
+                sc, st = values.string(claim), values.string(truth)
+                if sc == st:
+                    out[i] = (True, "ok", "")
+                else:
+                    out[i] = (False, "mismatch_string", _edit_diff(sc, st, max_edit_distance))
+
+    if num_idx:
+        if np is not None:
+            c = np.array(num_c, dtype=float)
+            t = np.array(num_t, dtype=float)
+            with np.errstate(invalid="ignore"):
+                abs_t = np.abs(t)
+                delta = np.abs(c - t)
+                # max(1.0, |t|) keeps 1.0 for NaN, like the builtin
+                tol = atol + rtol * np.where(abs_t > 1.0, abs_t, 1.0)
+                ok = delta <= tol
+            deltas, tols, oks = delta.tolist(), tol.tolist(), ok.tolist()
+        else:
+            deltas = [abs(a - b) for a, b in zip(num_c, num_t)]
+            tols = [atol + rtol * max(1.0, abs(b)) for b in num_t]
+            oks = [d <= t for d, t in zip(deltas, tols)]
+        for i, d, t, ok in zip(num_idx, deltas, tols, oks):
+            out[i] = (ok, "ok" if ok else "mismatch_number", f"delta={d} tol={t}")
+    return out
 
 # ------------------------- Extraction (optional) -------------------------
 
 KV_RE = re.compile(r"(?P<key>[A-Za-z0-9_ .\-/]+)\s*[:=]\s*(?P<val>[^\n;]+)")
 
-def extract_key_value_pairs(text: str) -> List[Tuple[str,str]]:
+# Pieces of KV_RE matched one at a time, none of which can backtrack across
+# another: KV_RE.finditer retries every start inside a long key-like run,
+# which is quadratic on text such as "aaaa...a" with no separator.
+_KEY_RUN_RE = re.compile(r"[A-Za-z0-9_ .\-/]+")
+_SEP_RE = re.compile(r"\s*[:=]")
+_WS_RUN_RE = re.compile(r"\s*")
+_VAL_RE = re.compile(r"[^\n;]+")
+
+def scan_key_values(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the raw (key, val) groups KV_RE.finditer would, in linear time.
+
+    A key-like run either matches with the whole run as its key or no start
+    inside it matches (the separator position is the same for all of them),
+    so each run is tried once and scanning resumes at its end.
+    """
+    pos, n = 0, len(text)
+    while pos < n:
+        run = _KEY_RUN_RE.search(text, pos)
+        if run is None:
+            return
+        start, key_end = run.span()
+        pos = key_end
+        sep = _SEP_RE.match(text, key_end)
+        if sep is None:
+            # later runs inside this whitespace fail at the same character,
+            # except trailing spaces, which join whatever follows
+            ws = text[key_end:_WS_RUN_RE.match(text, key_end).end()]
+            pos = key_end + len(ws.rstrip(" "))
+            continue
+        ws_start = sep.end()
+        ws_end = _WS_RUN_RE.match(text, ws_start).end()
+        val = _VAL_RE.match(text, ws_end)
+        if val is not None:
+            yield text[start:key_end], val.group()
+            pos = val.end()
+            continue
+        # KV_RE's \s* would give back whitespace: the value is then the last
+        # whitespace character that is not a newline
+        head = text[ws_start:ws_end].rstrip("\n")
+        if head:
+            yield text[start:key_end], head[-1]
+            pos = ws_start + len(head)
+        else:
+            pos = ws_end  # only newlines before ";" or the end: nothing here can match
+
+def extract_key_value_pairs(text: str, max_pairs: Union[int, None] = None) -> List[Tuple[str,str]]:
     pairs = []
-    for m in KV_RE.finditer(text):
-        k = norm_string(m.group("key"))
-        v = m.group("val").strip()
+    for key, val in scan_key_values(text):
+        k = norm_string(key)
+        v = val.strip()
         pairs.append((k, v))
+        if max_pairs is not None and len(pairs) >= max_pairs:
+            break
     return pairs
 
 # ------------------------- Main -------------------------
 
-def run(claims_path: str, truth_path: str, out_csv: str, out_json: str, atol: float, rtol: float):
-    truth = load_truth(truth_path)
-    claims = load_claims(claims_path)
+REPORT_FIELDS = ["example_id","key","claimed_value","truth_value","match","error_type","diff"]
+
+def run(claims_path: str, truth_path: str, out_csv: str, out_json: str, atol: float, rtol: float,
+        max_edit_distance: Union[int, None] = None, truth_db: Union[str, None] = None,
+        batch_size: int = 10_000, claims: Union[Iterable[Tuple[str, str, Any]], None] = None):
+    """
+    Stream claims through comparison into the report, batch_size at a time.
+    With truth_db, ground truth is looked up in an on-disk TruthStore instead
+    of an in-memory dict, so memory stays flat for any claim/truth volume.
+    `claims` may be passed as an iterable instead of reading claims_path.
+    """
+    values = ValueIndex()
+    store = None
+    if truth_db:
+        store = TruthStore.build(truth_path, truth_db)
+        lookup = store.get_many
+    else:
+        truth = load_truth(truth_path)
+        for v in truth.values():  # parse each truth value once
+            values.typed(v)
+        lookup = lambda keys: {k: truth[k] for k in keys if k in truth}
 
-    rows = []
     summary = {
         "total_claims": 0,
         "matched": 0,
@@ -301,45 +586,53 @@ def run(claims_path: str, truth_path: str, out_csv: str, out_json: str, atol: fl
         "by_error_type": {}
     }
 
-    for example_id, key, claimed_value in claims:
-        summary["total_claims"] += 1
-        if key not in truth:
-            rows.append({
-                "example_id": example_id,
-                "key": key,
-                "claimed_value": claimed_value,
-                "truth_value": "",
-                "match": False,
-                "error_type": "missing_truth_key",
-                "diff": ""
-            })
-            summary["missing_in_truth"] += 1
-            continue
-
-        truth_value = truth[key]
-        ok, err_type, diff = compare_values(claimed_value, truth_value, atol=atol, rtol=rtol)
-        if ok:
-            summary["matched"] += 1
-        else:
-            summary["mismatched"] += 1
-
-        rows.append({
-            "example_id": example_id,
-            "key": key,
-            "claimed_value": claimed_value,
-            "truth_value": truth_value,
-            "match": ok,
-            "error_type": err_type if not ok else "",
-            "diff": diff
-        })
-        summary["by_error_type"][err_type] = summary["by_error_type"].get(err_type, 0) + (0 if ok else 1)
-
-    # write CSV
+    claims = iter_claims(claims_path) if claims is None else iter(claims)
     with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["example_id","key","claimed_value","truth_value","match","error_type","diff"])
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
         writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
+        while True:
+            batch = list(itertools.islice(claims, batch_size))
+            if not batch:
+                break
+            found = lookup({key for _, key, _ in batch})
+            pairs = [(claimed_value, found[key]) for _, key, claimed_value in batch if key in found]
+            results = iter(compare_batch(pairs, atol=atol, rtol=rtol, values=values,
+                                         max_edit_distance=max_edit_distance))
+
+            for example_id, key, claimed_value in batch:
+                summary["total_claims"] += 1
+                if key not in found:
+                    writer.writerow({
+                        "example_id": example_id,
+                        "key": key,
+                        "claimed_value": claimed_value,
+                        "truth_value": "",
+                        "match": False,
+                        "error_type": "missing_truth_key",
+                        "diff": ""
+                    })
+                    summary["missing_in_truth"] += 1
+                    continue
+
+                truth_value = found[key]
+                ok, err_type, diff = next(results)
+                if ok:
+                    summary["matched"] += 1
+                else:
+                    summary["mismatched"] += 1
+
+                writer.writerow({
+                    "example_id": example_id,
+                    "key": key,
+                    "claimed_value": claimed_value,
+                    "truth_value": truth_value,
+                    "match": ok,
+                    "error_type": err_type if not ok else "",
+                    "diff": diff
+                })
+                summary["by_error_type"][err_type] = summary["by_error_type"].get(err_type, 0) + (0 if ok else 1)
+    if store is not None:
+        store.close()
 
     # write JSON summary
     if summary["total_claims"] > 0:
@@ -348,6 +641,7 @@ def run(claims_path: str, truth_path: str, out_csv: str, out_json: str, atol: fl
         summary["accuracy"] = None
     with open(out_json, "w", encoding="utf-8") as f:
         json.dump(summary, f, indent=2)
+    return summary
 
 def parse_args():
     ap = argparse.ArgumentParser(description="Validate LLM claims against ground-truth data.")
@@ -357,8 +651,16 @@ def parse_args():
     ap.add_argument("--summary", default="validate_summary.json", help="Path to output JSON summary.")
     ap.add_argument("--atol", type=float, default=0.0, help="Absolute tolerance for numeric comparison.")
     ap.add_argument("--rtol", type=float, default=0.0, help="Relative tolerance for numeric comparison.")
+    ap.add_argument("--max-edit-distance", type=int, default=None,
+                    help="Stop computing string edit distances above this (reported as levenshtein>N).")
+    ap.add_argument("--truth-db", default=None,
+                    help="SQLite index for ground truth (built from --truth, reused while it is unchanged).")
+    ap.add_argument("--batch-size", type=int, default=10_000, help="Claims compared per batch.")
+    instrument.add_arguments(ap)
     return ap.parse_args()
 
 if __name__ == "__main__":
     args = parse_args()
-    run(args.claims, args.truth, args.out, args.summary, args.atol, args.rtol)
+    instrument.setup(args)
+    run(args.claims, args.truth, args.out, args.summary, args.atol, args.rtol, args.max_edit_distance,
+        truth_db=args.truth_db, batch_size=args.batch_size)